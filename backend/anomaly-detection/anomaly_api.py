@@ -2,7 +2,7 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import json
-from anomaly_models import AnomalyDetectionModels, RuleBasedAnomalyDetector
+from anomaly_models import AnomalyDetectionModels, RuleBasedAnomalyDetector, magnus_vpd, magnus_dew_point
 import warnings
 import logging
 from typing import Dict, List, Optional, Union
@@ -1019,18 +1019,14 @@ class SensorSimulator:
         try:
             # Enhanced dew point calculation
             if temp > -40 and 0.1 <= humidity <= 99.9:
-                a, b = 17.625, 243.04
-                alpha = np.log(humidity / 100) + (a * temp) / (b + temp)
-                dew_point = (b * alpha) / (a - alpha)
+                dew_point = magnus_dew_point(temp, humidity, a=17.625, b=243.04)
                 data['dew_point'] = round(max(min(dew_point, temp - 0.1), temp - 50), 2)
             else:
                 data['dew_point'] = 18.0
                 
             # Enhanced VPD calculation
             if temp > -20 and 0.1 <= humidity <= 99.9:
-                saturation_vapor_pressure = 0.6108 * np.exp((17.27 * temp) / (temp + 237.3))
-                actual_vapor_pressure = saturation_vapor_pressure * (humidity / 100)
-                vpd = saturation_vapor_pressure - actual_vapor_pressure
+                vpd = magnus_vpd(temp, humidity)
                 data['vpd'] = round(max(0, min(vpd, 15)), 3)
             else:
                 data['vpd'] = 1.0
@@ -1101,13 +1097,8 @@ class SensorSimulator:
         if data['temperature'] > -100 and 0 < data['humidity'] <= 100:
             try:
                 temp, humidity = data['temperature'], data['humidity']
-                a, b = 17.625, 243.04
-                alpha = np.log(humidity / 100) + (a * temp) / (b + temp)
-                data['dew_point'] = round((b * alpha) / (a - alpha), 2)
-                
-                saturation_vapor_pressure = 0.6108 * np.exp((17.27 * temp) / (temp + 237.3))
-                actual_vapor_pressure = saturation_vapor_pressure * (humidity / 100)
-                data['vpd'] = round(max(0, saturation_vapor_pressure - actual_vapor_pressure), 3)
+                data['dew_point'] = round(magnus_dew_point(temp, humidity, a=17.625, b=243.04), 2)
+                data['vpd'] = round(max(0, magnus_vpd(temp, humidity)), 3)
             except Exception:
                 pass
         
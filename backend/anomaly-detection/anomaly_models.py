@@ -1,26 +1,79 @@
 import numpy as np
 import pandas as pd
 from sklearn.ensemble import IsolationForest
-from sklearn.preprocessing import StandardScaler, RobustScaler, PowerTransformer
+from sklearn.preprocessing import StandardScaler, RobustScaler, MaxAbsScaler
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report, confusion_matrix, roc_auc_score, precision_recall_curve
 from sklearn.svm import OneClassSVM
+from sklearn.linear_model import SGDOneClassSVM
+from sklearn.kernel_approximation import Nystroem
+from sklearn.pipeline import make_pipeline
 from sklearn.neighbors import LocalOutlierFactor
 from sklearn.covariance import EllipticEnvelope
 from sklearn.utils import resample
 import joblib
-import matplotlib.pyplot as plt
-import seaborn as sns
+from joblib import Parallel, delayed
 from datetime import datetime, timedelta
 import os
+import hashlib
+import math
+import numbers
+import tempfile
+import threading
 import warnings
 import logging
 from typing import Dict, List, Optional, Union, Tuple
-from collections import defaultdict
+from collections import defaultdict, deque
+from operator import itemgetter
+from concurrent.futures import ProcessPoolExecutor
 
 warnings.filterwarnings('ignore')
 logger = logging.getLogger(__name__)
 
+NS_PER_HOUR = 3_600_000_000_000
+NS_PER_DAY = 24 * NS_PER_HOUR
+
+# ขอบบนของแต่ละช่วงใน temp_category / humidity_category (ช่วงปิดขวาแบบ pd.cut)
+TEMP_CATEGORY_EDGES = np.array([15.0, 25.0, 35.0])
+HUMIDITY_CATEGORY_EDGES = np.array([40.0, 70.0, 90.0])
+
+# thresholds ของ RuleBasedAnomalyDetector - ค่าคงที่ระดับ module อ่านผ่าน global ได้เร็วกว่า dict lookup ใน hot path
+VPD_CRITICAL = 0.3
+VPD_WARNING = 0.5
+DEW_POINT_CRITICAL = 1.2
+VOLTAGE_CRITICAL = 2.7
+VOLTAGE_WARNING = 2.9
+BATTERY_CRITICAL = 12
+BATTERY_WARNING = 20
+TEMP_CHANGE_CRITICAL = 10
+TEMP_CHANGE_WARNING = 6
+HUMIDITY_EXTREME_HIGH = 96
+HUMIDITY_EXTREME_LOW = 20
+CO2_CRITICAL_HIGH = 2000
+CO2_WARNING_HIGH = 1600
+
+# เซนเซอร์ที่กฎแต่ละตัวตรวจ (และเกณฑ์ต่อเซนเซอร์) - สร้างครั้งเดียว ไม่ต้องสร้าง list/dict ใหม่ทุกครั้งที่เรียกกฎ
+CRITICAL_SENSORS = ('temperature', 'humidity', 'voltage')
+FLUCTUATION_LIMITS = (('temperature', 0.15), ('humidity', 0.20), ('voltage', 0.25), ('co2', 0.30))
+DRIFT_LIMITS = (('temperature', 0.8), ('ec', 0.15), ('ph', 0.2))  # หน่วยต่อ reading
+
+# error codes ของเซนเซอร์ (None = ไม่มีค่า)
+SENSOR_FAILURE_VALUES = (0, -999, 999, -1, 9999, None)
+
+def saturation_vapor_pressure(temp):
+    """ความดันไอน้ำอิ่มตัว (kPa) จากอุณหภูมิ (°C) ตามสูตร Magnus - ใช้ได้ทั้ง scalar และ ndarray"""
+    return 0.6108 * np.exp((17.27 * temp) / (temp + 237.3))
+
+def magnus_vpd(temp, humidity):
+    """VPD (kPa) จากอุณหภูมิ (°C) และความชื้นสัมพัทธ์ (%)"""
+    svp = saturation_vapor_pressure(temp)
+    return svp - svp * (humidity / 100)
+
+def magnus_dew_point(temp, humidity, a=17.27, b=237.7):
+    """จุดน้ำค้าง (°C) จากอุณหภูมิ (°C) และความชื้นสัมพัทธ์ (%) ตามสูตร Magnus (a, b = ค่าคงที่ของสูตร)"""
+    alpha = ((a * temp) / (b + temp)) + np.log(humidity / 100)
+    return (b * alpha) / (a - alpha)
+
 class FeatureManager:
     """จัดการ Feature alignment และ version control"""
     
@@ -41,6 +94,10 @@ class FeatureManager:
     
     def align_features(self, X, method='pad_zeros'):
         """จัดการ feature dimension mismatch"""
+        # กรณีปกติใน predict path: shape ตรงอยู่แล้ว คืน X เดิมทันที
+        if isinstance(X, np.ndarray) and X.ndim == 2 and X.shape[1] == self.target_features:
+            return X
+        
         if X is None or len(X.shape) != 2:
             logger.error("Invalid input for feature alignment")
             return X
@@ -53,22 +110,19 @@ class FeatureManager:
         logger.warning(f"Feature mismatch: {current_features} vs {self.target_features}")
         
         if current_features < self.target_features:
-            # เพิ่ม features ด้วยการ pad zeros หรือ mean
+            # เพิ่ม features ด้วยการ pad zeros หรือ mean - จองผลลัพธ์ครั้งเดียว ไม่ต้อง concatenate
             missing_count = self.target_features - current_features
+            X_aligned = np.zeros(
+                (X.shape[0], self.target_features),
+                dtype=np.result_type(X.dtype, np.float64)
+            )
+            X_aligned[:, :current_features] = X
             
-            if method == 'pad_zeros':
-                padding = np.zeros((X.shape[0], missing_count))
-            elif method == 'pad_mean':
+            if method == 'pad_mean':
                 mean_values = np.mean(X, axis=0)
-                padding = np.tile(mean_values[:min(len(mean_values), missing_count)], 
-                                (X.shape[0], 1))
-                if padding.shape[1] < missing_count:
-                    additional = np.zeros((X.shape[0], missing_count - padding.shape[1]))
-                    padding = np.concatenate([padding, additional], axis=1)
-            else:
-                padding = np.zeros((X.shape[0], missing_count))
+                n_mean = min(len(mean_values), missing_count)
+                X_aligned[:, current_features:current_features + n_mean] = mean_values[:n_mean]
             
-            X_aligned = np.concatenate([X, padding], axis=1)
             logger.info(f"Added {missing_count} features via {method}")
             
         else:  # current_features > self.target_features
@@ -89,6 +143,21 @@ class AnomalyDetectionModels:
         self.model_performance = {}
         self.feature_manager = FeatureManager(target_features=49)
         
+        # (offset, scale) แบบ float32 ของ scaler เชิงเส้น ดึงจาก sklearn object ครั้งเดียว (key = id ของ scaler)
+        self._scaler_arrays = {}
+        self._scaler_arrays_lock = threading.Lock()
+        
+        # StandardScaler ที่ fit บนแถวปกติชุดเดียวกันระหว่างเทรน ensemble (LOF และ Elliptic Envelope ใช้ร่วมกัน)
+        self._prep_normal_cache = {}
+        self._prep_normal_lock = threading.Lock()
+        
+        # LOF ที่ fit ล่าสุด (key = digest ของข้อมูลที่ scale แล้ว + params) - เทรนเดี่ยวแล้วเทรน ensemble ซ้ำบนข้อมูลเดิมไม่ต้อง fit ใหม่
+        # ล้างเมื่อ train_ensemble_model เสร็จ (LOF เก็บสำเนาข้อมูลเทรนไว้ในตัว)
+        self._lof_cache = {}
+        
+        # batch เล็กกว่านี้เดิน tree ของ IsolationForest แบบ sequential เร็วกว่า (ตาม sklearn)
+        self._threaded_tree_min_samples = 1000
+        
         # Features หลัก - Fixed order
         self.feature_columns = [
             'temperature', 'humidity', 'co2', 'ec', 'ph', 
@@ -104,13 +173,16 @@ class AnomalyDetectionModels:
                 'n_estimators': 300,  # Reduced for stability
                 'max_samples': 0.65,
                 'max_features': 0.75,
-                'random_state': 42
+                'random_state': 42,
+                'n_jobs': -1
             },
             'one_class_svm': {
                 'kernel': 'rbf',
                 'gamma': 'scale',
                 'nu': 0.12,
-                'shrinking': True
+                'shrinking': True,
+                # True = ข้อมูลเกิน 5000 แถวใช้ Nystroem + SGDOneClassSVM (เร็วกว่ามากแต่ F1 ต่ำกว่าเล็กน้อย)
+                'approximate_kernel': False
             },
             'local_outlier_factor': {
                 'n_neighbors': 25,
@@ -137,147 +209,165 @@ class AnomalyDetectionModels:
         """สร้าง Features ขั้นสูงแบบ Fixed Version - ต้องได้ 49 features เสมอ"""
         logger.info("สร้าง advanced features v2.1 (Fixed)...")
         
-        df_enhanced = df.copy()
+        # สะสม derived features เป็น ndarray ไว้ใน dict แล้วต่อเข้ากับ df ครั้งเดียวตอนจบ (ไม่ copy ทั้งเฟรมตั้งแต่ต้น)
+        new_cols = {}
+        n_rows = len(df)
         self.derived_features = []
         
         try:
-            # 1. Rolling Statistics (12 features)
-            rolling_cols = ['temperature', 'humidity', 'voltage', 'battery_level']
-            for col in rolling_cols:
-                if col in df_enhanced.columns:
-                    window_size = min(5, len(df_enhanced))
-                    
-                    rolling_data = df_enhanced[col].rolling(
-                        window=window_size, 
-                        min_periods=1, 
-                        center=False
-                    )
-                    
-                    df_enhanced[f'{col}_rolling_mean'] = rolling_data.mean()
-                    df_enhanced[f'{col}_rolling_std'] = rolling_data.std().fillna(0)
-                    df_enhanced[f'{col}_rolling_range'] = (
-                        rolling_data.max() - rolling_data.min()
-                    ).fillna(0)
-                    
+            # 1. Rolling Statistics (12 features) - rolling ทั้งบล็อกครั้งเดียว
+            rolling_cols = [
+                col for col in ['temperature', 'humidity', 'voltage', 'battery_level']
+                if col in df.columns
+            ]
+            if rolling_cols:
+                window_size = min(5, n_rows)
+                
+                rolling_data = df[rolling_cols].rolling(
+                    window=window_size, 
+                    min_periods=1, 
+                    center=False
+                )
+                
+                rolling_mean = rolling_data.mean()
+                rolling_std = rolling_data.std().fillna(0)
+                rolling_range = (rolling_data.max() - rolling_data.min()).fillna(0)
+                
+                for col in rolling_cols:
+                    new_cols[f'{col}_rolling_mean'] = rolling_mean[col].to_numpy()
+                    new_cols[f'{col}_rolling_std'] = rolling_std[col].to_numpy()
+                    new_cols[f'{col}_rolling_range'] = rolling_range[col].to_numpy()
                     self.derived_features.extend([
-                        f'{col}_rolling_mean', 
-                        f'{col}_rolling_std', 
-                        f'{col}_rolling_range'
+                        f'{col}_rolling_mean', f'{col}_rolling_std', f'{col}_rolling_range'
                     ])
             
-            # 2. Ratio Features (4 features)
-            if 'temperature' in df_enhanced.columns and 'humidity' in df_enhanced.columns:
-                safe_humidity = df_enhanced['humidity'].replace(0, 0.1)
-                df_enhanced['temp_humidity_ratio'] = (
-                    df_enhanced['temperature'] / safe_humidity
-                ).replace([np.inf, -np.inf], 0)
-                self.derived_features.append('temp_humidity_ratio')
-            
-            if 'voltage' in df_enhanced.columns and 'battery_level' in df_enhanced.columns:
-                safe_battery = df_enhanced['battery_level'].replace(0, 0.1)
-                df_enhanced['voltage_battery_ratio'] = (
-                    df_enhanced['voltage'] / safe_battery
-                ).replace([np.inf, -np.inf], 0)
-                self.derived_features.append('voltage_battery_ratio')
-            
-            if 'vpd' in df_enhanced.columns and 'humidity' in df_enhanced.columns:
-                safe_vpd = np.clip(df_enhanced['vpd'], 0, 15)
-                df_enhanced['vpd_humidity_interaction'] = (
-                    safe_vpd * df_enhanced['humidity'] / 100
-                ).replace([np.inf, -np.inf], 0)
-                self.derived_features.append('vpd_humidity_interaction')
-            
-            if 'ec' in df_enhanced.columns and 'ph' in df_enhanced.columns:
-                df_enhanced['ec_ph_interaction'] = (
-                    df_enhanced['ec'] * df_enhanced['ph']
-                ).replace([np.inf, -np.inf], 0)
-                self.derived_features.append('ec_ph_interaction')
-            
-            # 3. Difference Features (4 features)
+            # 2. Ratio Features (4 features) - คำนวณบน ndarray แล้วแทน ±inf ด้วย 0 แบบ in-place
+            def column_values(col):
+                return df[col].to_numpy(dtype=np.float64)
+            
+            def zero_infinite(values):
+                values[np.isinf(values)] = 0
+                return values
+            
+            with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+                if 'temperature' in df.columns and 'humidity' in df.columns:
+                    humidity_values = column_values('humidity')
+                    safe_humidity = np.where(humidity_values == 0, 0.1, humidity_values)
+                    new_cols['temp_humidity_ratio'] = zero_infinite(
+                        column_values('temperature') / safe_humidity
+                    )
+                    self.derived_features.append('temp_humidity_ratio')
+                
+                if 'voltage' in df.columns and 'battery_level' in df.columns:
+                    battery_values = column_values('battery_level')
+                    safe_battery = np.where(battery_values == 0, 0.1, battery_values)
+                    new_cols['voltage_battery_ratio'] = zero_infinite(
+                        column_values('voltage') / safe_battery
+                    )
+                    self.derived_features.append('voltage_battery_ratio')
+                
+                if 'vpd' in df.columns and 'humidity' in df.columns:
+                    safe_vpd = np.clip(column_values('vpd'), 0, 15)
+                    new_cols['vpd_humidity_interaction'] = zero_infinite(
+                        safe_vpd * column_values('humidity') / 100
+                    )
+                    self.derived_features.append('vpd_humidity_interaction')
+                
+                if 'ec' in df.columns and 'ph' in df.columns:
+                    new_cols['ec_ph_interaction'] = zero_infinite(
+                        column_values('ec') * column_values('ph')
+                    )
+                    self.derived_features.append('ec_ph_interaction')
+            
+            # 3. Difference Features (4 features) - np.subtract ลง buffer เดียว (แถวแรกและ NaN เป็น 0 แบบ diff().fillna(0))
             diff_cols = ['temperature', 'humidity', 'voltage', 'co2']
             for col in diff_cols:
-                if col in df_enhanced.columns:
-                    df_enhanced[f'{col}_diff'] = df_enhanced[col].diff().fillna(0)
-                    df_enhanced[f'{col}_diff'] = np.clip(
-                        df_enhanced[f'{col}_diff'], -100, 100
-                    )
+                if col in df.columns:
+                    col_values = column_values(col)
+                    col_diff = np.zeros_like(col_values)
+                    with np.errstate(invalid='ignore'):
+                        np.subtract(col_values[1:], col_values[:-1], out=col_diff[1:])
+                    col_diff[np.isnan(col_diff)] = 0
+                    new_cols[f'{col}_diff'] = np.clip(col_diff, -100, 100, out=col_diff)
                     self.derived_features.append(f'{col}_diff')
             
             # 4. Statistical Features (4 features)
             sensor_cols = ['temperature', 'humidity', 'voltage', 'co2']
-            available_cols = [col for col in sensor_cols if col in df_enhanced.columns]
+            available_cols = [col for col in sensor_cols if col in df.columns]
             
             if len(available_cols) >= 2:
                 for i, col in enumerate(available_cols[:4]):  # จำกัดเป็น 4 features
-                    col_data = df_enhanced[col].values
+                    col_data = df[col].values
                     if len(col_data) > 1:
                         std_val = np.std(col_data)
                         if std_val > 0:
                             z_scores = (col_data - np.mean(col_data)) / std_val
-                            df_enhanced[f'{col}_zscore'] = np.clip(z_scores, -5, 5)
+                            new_cols[f'{col}_zscore'] = np.clip(z_scores, -5, 5)
                             self.derived_features.append(f'{col}_zscore')
             
-            # 5. Binned Features (2 features)
-            if 'temperature' in df_enhanced.columns:
-                temp_data = df_enhanced['temperature'].replace([np.inf, -np.inf], np.nan)
+            # 5. Binned Features (2 features) - np.searchsorted ให้ code เดียวกับ pd.cut (ช่วงปิดขวา)
+            if 'temperature' in df.columns:
+                temp_data = df['temperature'].replace([np.inf, -np.inf], np.nan)
                 temp_data = temp_data.fillna(temp_data.median())
                 
                 try:
-                    df_enhanced['temp_category'] = pd.cut(
-                        temp_data,
-                        bins=[-np.inf, 15, 25, 35, np.inf],
-                        labels=[0, 1, 2, 3],
-                        include_lowest=True
-                    ).astype(float)
+                    # bins=[-inf, 15, 25, 35, inf] -> 0..3
+                    temp_values = temp_data.to_numpy(dtype=np.float64)
+                    temp_category = np.searchsorted(TEMP_CATEGORY_EDGES, temp_values, side='left').astype(float)
+                    temp_category[np.isnan(temp_values)] = np.nan
+                    new_cols['temp_category'] = temp_category
                     self.derived_features.append('temp_category')
                 except Exception:
-                    df_enhanced['temp_category'] = 1
+                    new_cols['temp_category'] = np.ones(n_rows, dtype=np.int64)
                     self.derived_features.append('temp_category')
             
-            if 'humidity' in df_enhanced.columns:
-                humidity_data = df_enhanced['humidity'].replace([np.inf, -np.inf], np.nan)
+            if 'humidity' in df.columns:
+                humidity_data = df['humidity'].replace([np.inf, -np.inf], np.nan)
                 humidity_data = humidity_data.fillna(humidity_data.median())
                 
                 try:
-                    df_enhanced['humidity_category'] = pd.cut(
-                        humidity_data,
-                        bins=[0, 40, 70, 90, 100],
-                        labels=[0, 1, 2, 3],
-                        include_lowest=True
+                    # bins=[0, 40, 70, 90, 100] (รวม 0) -> 0..3, นอกช่วง 0-100 เป็น NaN เหมือน pd.cut
+                    humidity_values = humidity_data.to_numpy(dtype=np.float64)
+                    humidity_category = np.searchsorted(
+                        HUMIDITY_CATEGORY_EDGES, humidity_values, side='left'
                     ).astype(float)
+                    out_of_range = ~((humidity_values >= 0) & (humidity_values <= 100))
+                    humidity_category[out_of_range] = np.nan
+                    new_cols['humidity_category'] = humidity_category
                     self.derived_features.append('humidity_category')
                 except Exception:
-                    df_enhanced['humidity_category'] = 1
+                    new_cols['humidity_category'] = np.ones(n_rows, dtype=np.int64)
                     self.derived_features.append('humidity_category')
             
-            # 6. Environmental Stress และ Power Health (2 features)
-            if all(col in df_enhanced.columns for col in ['vpd', 'dew_point', 'temperature']):
-                safe_vpd = np.clip(df_enhanced['vpd'].fillna(1.0), 0, 15)
-                safe_dew_point = df_enhanced['dew_point'].fillna(18.0)
-                safe_temperature = df_enhanced['temperature'].fillna(25.0)
+            # 6. Environmental Stress และ Power Health (2 features) - คำนวณบน ndarray ไม่ผ่าน Series ทีละขั้น
+            if all(col in df.columns for col in ['vpd', 'dew_point', 'temperature']):
+                safe_vpd = np.clip(df['vpd'].fillna(1.0).to_numpy(), 0, 15)
+                safe_dew_point = df['dew_point'].fillna(18.0).to_numpy()
+                safe_temperature = df['temperature'].fillna(25.0).to_numpy()
                 
-                stress_score = 0
-                stress_score += (safe_vpd < 0.4).astype(int)
-                stress_score += (safe_dew_point > safe_temperature - 2).astype(int)
-                stress_score += (safe_temperature > 38).astype(int)
-                stress_score += (safe_temperature < 12).astype(int)
+                stress_score = (
+                    (safe_vpd < 0.4).astype(np.int64) +
+                    (safe_dew_point > safe_temperature - 2) +
+                    (safe_temperature > 38) +
+                    (safe_temperature < 12)
+                )
                 
-                df_enhanced['environmental_stress'] = np.clip(stress_score, 0, 4)
+                new_cols['environmental_stress'] = np.clip(stress_score, 0, 4)
                 self.derived_features.append('environmental_stress')
             
-            if all(col in df_enhanced.columns for col in ['voltage', 'battery_level']):
-                voltage_health = (df_enhanced['voltage'] > 3.0).astype(int)
-                battery_health = (df_enhanced['battery_level'] > 20).astype(int)
-                df_enhanced['power_health'] = voltage_health + battery_health
+            if all(col in df.columns for col in ['voltage', 'battery_level']):
+                voltage_health = (df['voltage'].to_numpy() > 3.0).astype(np.int64)
+                battery_health = df['battery_level'].to_numpy() > 20
+                new_cols['power_health'] = voltage_health + battery_health
                 self.derived_features.append('power_health')
             
-            # 7. Missing indicators (9 features สำหรับ sensor หลัก)
-            missing_features = []
-            for col in self.feature_columns:
-                if col in df_enhanced.columns:
-                    missing_col = f'{col}_is_missing'
-                    df_enhanced[missing_col] = df_enhanced[col].isnull().astype(int)
-                    missing_features.append(missing_col)
+            # 7. Missing indicators (9 features สำหรับ sensor หลัก) - สร้างทั้งบล็อกด้วย isna ครั้งเดียว
+            missing_source_cols = [col for col in self.feature_columns if col in df.columns]
+            missing_features = [f'{col}_is_missing' for col in missing_source_cols]
+            
+            if missing_source_cols:
+                missing_block = df[missing_source_cols].isna().to_numpy(dtype=np.int8)
+                new_cols.update(zip(missing_features, missing_block.T))
             
             self.derived_features.extend(missing_features)
             
@@ -292,21 +382,21 @@ class AnomalyDetectionModels:
                 logger.warning(f"Adding {needed} additional features to reach target")
                 
                 # สร้าง polynomial features
-                if 'temperature' in df_enhanced.columns:
-                    df_enhanced['temp_squared'] = df_enhanced['temperature'] ** 2
+                if 'temperature' in df.columns:
+                    new_cols['temp_squared'] = df['temperature'].to_numpy() ** 2
                     self.derived_features.append('temp_squared')
                     needed -= 1
                 
-                if needed > 0 and 'humidity' in df_enhanced.columns:
-                    df_enhanced['humidity_squared'] = df_enhanced['humidity'] ** 2
+                if needed > 0 and 'humidity' in df.columns:
+                    new_cols['humidity_squared'] = df['humidity'].to_numpy() ** 2
                     self.derived_features.append('humidity_squared')
                     needed -= 1
                 
-                # เพิ่ม synthetic features ถ้าจำเป็น
-                for i in range(needed):
-                    feature_name = f'synthetic_feature_{i}'
-                    df_enhanced[feature_name] = np.random.normal(0, 0.01, len(df_enhanced))
-                    self.derived_features.append(feature_name)
+                # เพิ่ม synthetic features ถ้าจำเป็น - บล็อกศูนย์บล็อกเดียว (deterministic ไม่ใส่ noise เข้าโมเดล)
+                if needed > 0:
+                    synthetic_features = [f'synthetic_feature_{i}' for i in range(needed)]
+                    new_cols.update(zip(synthetic_features, np.zeros((needed, n_rows))))
+                    self.derived_features.extend(synthetic_features)
             
             elif current_derived > expected_derived:
                 # ลด features ส่วนเกิน
@@ -314,28 +404,38 @@ class AnomalyDetectionModels:
                 logger.warning(f"Removing {excess} excess features")
                 self.derived_features = self.derived_features[:expected_derived]
             
-            # ทำความสะอาด derived features
+            # ทำความสะอาด derived features - รวมคอลัมน์ float เป็นบล็อก (k, n) เดียวแล้วทำ in-place ครั้งเดียว
+            # (คอลัมน์ int ไม่มี NaN/inf อยู่แล้ว)
             for feature in self.derived_features:
-                if feature in df_enhanced.columns:
-                    df_enhanced[feature] = df_enhanced[feature].replace(
-                        [np.inf, -np.inf], 0
-                    ).fillna(0)
-                    
-                    if df_enhanced[feature].dtype in ['float64', 'float32']:
-                        df_enhanced[feature] = np.clip(df_enhanced[feature], -1000, 1000)
-                else:
+                if feature not in new_cols:
                     # สร้าง feature ที่หายไป
-                    df_enhanced[feature] = 0
+                    new_cols[feature] = np.zeros(n_rows, dtype=np.int64)
+            
+            float_features = [
+                feature for feature in self.derived_features
+                if np.asarray(new_cols[feature]).dtype.kind == 'f'
+            ]
+            if float_features:
+                float_block = np.vstack([new_cols[feature] for feature in float_features]).astype(np.float64, copy=False)
+                np.nan_to_num(float_block, copy=False, nan=0.0, posinf=0.0, neginf=0.0)
+                np.clip(float_block, -1000, 1000, out=float_block)
+                new_cols.update(zip(float_features, float_block))
         
         except Exception as e:
             logger.error(f"Error in create_advanced_features_fixed: {e}")
             # สร้าง minimal derived features
             needed_features = 35  # 49 - 14 = 35
-            self.derived_features = []
-            for i in range(needed_features):
-                feature_name = f'default_feature_{i}'
-                df_enhanced[feature_name] = 0
-                self.derived_features.append(feature_name)
+            self.derived_features = [f'default_feature_{i}' for i in range(needed_features)]
+            new_cols = dict(zip(
+                self.derived_features, np.zeros((needed_features, n_rows), dtype=np.int64)
+            ))
+        
+        # ต่อ derived features เข้ากับ df ครั้งเดียว (คอลัมน์ชื่อซ้ำใน df เดิมถูกแทนที่)
+        overlapping = [col for col in new_cols if col in df.columns]
+        base_df = df.drop(columns=overlapping) if overlapping else df
+        df_enhanced = pd.concat(
+            [base_df, pd.DataFrame(new_cols, index=df.index)], axis=1
+        )
         
         final_derived_count = len(self.derived_features)
         logger.info(f"สร้าง {final_derived_count} advanced features เสร็จสิ้น")
@@ -346,16 +446,26 @@ class AnomalyDetectionModels:
         """เตรียมข้อมูลแบบขั้นสูง - Fixed Version รับประกัน 49 features"""
         logger.info("เตรียมข้อมูลแบบขั้นสูง v2.1 (Fixed)...")
         
-        df_clean = df.copy()
+        # shallow copy: เพิ่ม/แทนที่คอลัมน์ได้โดยไม่กระทบ df ของผู้เรียก และไม่ต้อง copy ข้อมูลทั้งเฟรม
+        df_clean = df.copy(deep=False)
         
         try:
             # แปลง timestamp และสร้าง time features
             if 'timestamp' in df_clean.columns:
                 df_clean['timestamp'] = pd.to_datetime(df_clean['timestamp'], errors='coerce')
+                timestamps = df_clean['timestamp']
                 
-                df_clean['hour'] = df_clean['timestamp'].dt.hour
-                df_clean['day_of_week'] = df_clean['timestamp'].dt.dayofweek
-                df_clean['month'] = df_clean['timestamp'].dt.month
+                if timestamps.dt.tz is None and timestamps.notna().all():
+                    # hour / day_of_week จาก int64 nanoseconds โดยตรง (1970-01-01 เป็นวันพฤหัสบดี = 3)
+                    ts_ns = timestamps.to_numpy(dtype='datetime64[ns]').view(np.int64)
+                    df_clean['hour'] = ((ts_ns // NS_PER_HOUR) % 24).astype(np.int8)
+                    df_clean['day_of_week'] = ((ts_ns // NS_PER_DAY + 3) % 7).astype(np.int8)
+                    df_clean['month'] = timestamps.dt.month.astype(np.int8)
+                else:
+                    # มี NaT หรือมี timezone - ใช้ accessor ของ pandas
+                    df_clean['hour'] = timestamps.dt.hour
+                    df_clean['day_of_week'] = timestamps.dt.dayofweek
+                    df_clean['month'] = timestamps.dt.month
                 df_clean['is_night'] = ((df_clean['hour'] >= 22) | (df_clean['hour'] <= 6)).astype(int)
                 df_clean['is_weekend'] = (df_clean['day_of_week'] >= 5).astype(int)
             else:
@@ -380,56 +490,60 @@ class AnomalyDetectionModels:
             # ทำความสะอาดข้อมูลเซนเซอร์
             numeric_cols = self.feature_columns
             error_codes = [-999, -1, 9999]
+            clip_ranges = {'temperature': (-30, 70), 'humidity': (0, 100), 'voltage': (0, 5)}
             
-            for col in numeric_cols:
-                if col in df_clean.columns:
+            # ทุกขั้นตอนแทนที่คอลัมน์ทั้งคอลัมน์ (ไม่เขียนทับ buffer เดิม) จึงใช้ shallow copy ของ df ได้อย่างปลอดภัย
+            if 'is_anomaly' in df_clean.columns:
+                normal_mask = (df_clean['is_anomaly'] == 0).to_numpy()
+                
+                for col in numeric_cols:
+                    if col not in df_clean.columns:
+                        continue
+                    
+                    values = df_clean[col].to_numpy()
+                    changed = False
+                    
                     # แทนที่ error codes ด้วย NaN สำหรับข้อมูลปกติ
-                    if 'is_anomaly' in df_clean.columns:
-                        for error_code in error_codes:
-                            normal_mask = (df_clean['is_anomaly'] == 0) & (df_clean[col] == error_code)
-                            df_clean.loc[normal_mask, col] = np.nan
+                    error_mask = normal_mask & df_clean[col].isin(error_codes).to_numpy()
+                    if error_mask.any():
+                        values = values.astype(np.float64)
+                        values[error_mask] = np.nan
+                        changed = True
                     
-                    # จำกัดค่าให้อยู่ในช่วงสมเหตุสมผล (เฉพาะข้อมูลปกติ)
-                    if 'is_anomaly' in df_clean.columns:
-                        normal_mask = df_clean['is_anomaly'] == 0
-                        
-                        if col == 'temperature':
-                            df_clean.loc[normal_mask, col] = df_clean.loc[normal_mask, col].apply(
-                                lambda x: np.clip(x, -30, 70) if pd.notnull(x) else np.nan
-                            )
-                        elif col == 'humidity':
-                            df_clean.loc[normal_mask, col] = df_clean.loc[normal_mask, col].apply(
-                                lambda x: np.clip(x, 0, 100) if pd.notnull(x) else np.nan
-                            )
-                        elif col == 'voltage':
-                            df_clean.loc[normal_mask, col] = df_clean.loc[normal_mask, col].apply(
-                                lambda x: np.clip(x, 0, 5) if pd.notnull(x) else np.nan
-                            )
-                        elif col == 'vpd':
-                            df_clean[col] = df_clean[col].apply(
-                                lambda x: np.clip(x, 0, 15) if pd.notnull(x) else np.nan
-                            )
+                    # จำกัดค่าให้อยู่ในช่วงสมเหตุสมผล (เฉพาะข้อมูลปกติ) - np.clip ทั้ง array, NaN ผ่านไปตามเดิม
+                    if col in clip_ranges:
+                        if not changed:
+                            values = values.copy()
+                        lower, upper = clip_ranges[col]
+                        values[normal_mask] = np.clip(values[normal_mask], lower, upper)
+                        changed = True
+                    elif col == 'vpd':
+                        values = np.clip(values, 0, 15)
+                        changed = True
+                    
+                    # คอลัมน์ที่ไม่เปลี่ยนยังใช้ buffer เดิมร่วมกับ df ของผู้เรียก
+                    if changed:
+                        df_clean[col] = values
             
             # สร้าง advanced features
             df_clean = self.create_advanced_features_fixed(df_clean)
             
-            # เติมค่าที่หายไปด้วยวิธี intelligent
-            for col in self.feature_columns:
-                if col in df_clean.columns:
-                    if 'is_anomaly' in df_clean.columns:
-                        normal_median = df_clean[df_clean['is_anomaly'] == 0][col].median()
-                    else:
-                        normal_median = df_clean[col].median()
-                    
-                    if pd.isna(normal_median):
-                        fallback_values = {
-                            'temperature': 25.0, 'humidity': 65.0, 'voltage': 3.3,
-                            'battery_level': 80.0, 'co2': 800.0, 'ec': 1.5,
-                            'ph': 6.5, 'dew_point': 18.0, 'vpd': 1.0
-                        }
-                        normal_median = fallback_values.get(col, 0)
-                    
-                    df_clean[col] = df_clean[col].fillna(normal_median)
+            # เติมค่าที่หายไปด้วยวิธี intelligent - คำนวณ median ทุกคอลัมน์ในครั้งเดียว
+            sensor_cols = [col for col in self.feature_columns if col in df_clean.columns]
+            if sensor_cols:
+                if 'is_anomaly' in df_clean.columns:
+                    normal_medians = df_clean.loc[df_clean['is_anomaly'] == 0, sensor_cols].median()
+                else:
+                    normal_medians = df_clean[sensor_cols].median()
+                
+                fallback_values = pd.Series({
+                    'temperature': 25.0, 'humidity': 65.0, 'voltage': 3.3,
+                    'battery_level': 80.0, 'co2': 800.0, 'ec': 1.5,
+                    'ph': 6.5, 'dew_point': 18.0, 'vpd': 1.0
+                })
+                normal_medians = normal_medians.fillna(fallback_values).fillna(0)
+                
+                df_clean[sensor_cols] = df_clean[sensor_cols].fillna(normal_medians)
             
             # เติมค่าที่หายไปสำหรับ derived features
             for col in self.derived_features:
@@ -457,10 +571,9 @@ class AnomalyDetectionModels:
                 if len(final_features) < expected_count:
                     # เพิ่ม features
                     needed = expected_count - len(final_features)
-                    for i in range(needed):
-                        extra_feature = f'padding_feature_{i}'
-                        df_clean[extra_feature] = 0
-                        final_features.append(extra_feature)
+                    extra_features = [f'padding_feature_{i}' for i in range(needed)]
+                    df_clean[extra_features] = np.zeros((len(df_clean), needed), dtype=np.int64)
+                    final_features.extend(extra_features)
                 elif len(final_features) > expected_count:
                     # ตัด features ส่วนเกิน
                     final_features = final_features[:expected_count]
@@ -482,9 +595,9 @@ class AnomalyDetectionModels:
             
             # เพิ่ม features ให้ครบ 49
             needed = 49 - len(basic_features)
-            for i in range(needed):
-                basic_features.append(f'fallback_feature_{i}')
-                df_clean[f'fallback_feature_{i}'] = 0
+            fallback_features = [f'fallback_feature_{i}' for i in range(needed)]
+            df_clean[fallback_features] = np.zeros((len(df_clean), needed), dtype=np.int64)
+            basic_features.extend(fallback_features)
             
             return df_clean, basic_features
     
@@ -493,15 +606,16 @@ class AnomalyDetectionModels:
         if not isinstance(X, np.ndarray):
             X = np.array(X)
         
+        # copy ครั้งเดียว แล้วทำความสะอาดแบบ in-place บน buffer เดียวกัน
+        # (ทำใน dtype เดิมก่อนแปลงเป็น float32 - ค่าที่เกินช่วง float32 จะถูก clip ไม่ใช่กลายเป็น inf)
         X_clean = X.copy()
         
-        # แทนที่ infinity และ extreme values
-        X_clean = np.where(np.isinf(X_clean), 0, X_clean)
-        X_clean = np.where(np.isnan(X_clean), 0, X_clean)
+        # แทนที่ infinity และ NaN ด้วย 0
+        np.nan_to_num(X_clean, copy=False, nan=0.0, posinf=0.0, neginf=0.0)
         
         # จำกัดค่าให้อยู่ในช่วงปลอดภัย
         safe_max = 1000
-        X_clean = np.clip(X_clean, -safe_max, safe_max)
+        np.clip(X_clean, -safe_max, safe_max, out=X_clean)
         
         # Feature alignment ก่อน return
         X_aligned = self.feature_manager.align_features(X_clean, method='pad_zeros')
@@ -529,8 +643,8 @@ class AnomalyDetectionModels:
             scaler = self.scalers[model_name]
             
             try:
-                X_test_scaled = scaler.transform(X_test_clean)
-                predictions = model.predict(X_test_scaled)
+                X_test_scaled = self._apply_scaler(scaler, X_test_clean)
+                predictions = self._model_predict(model, X_test_scaled)
                 return (predictions == -1).astype(int)
             except Exception as e:
                 logger.error(f"Error in predict_anomalies for {model_name}: {e}")
@@ -547,36 +661,185 @@ class AnomalyDetectionModels:
         if not models:
             raise ValueError("ไม่มีโมเดลใน ensemble")
         
-        ensemble_predictions = np.zeros(len(X_test))
-        successful_predictions = 0
+        # align และทำให้ contiguous ครั้งเดียว แล้วใช้ร่วมกันทุกโมเดล
+        X_test = np.ascontiguousarray(
+            self.feature_manager.align_features(X_test, method='pad_zeros')
+        )
         
-        for model_name, weight in self.ensemble_weights.items():
-            if model_name in models and model_name in scalers:
+        member_names = [
+            model_name for model_name in self.ensemble_weights
+            if model_name in models and model_name in scalers
+        ]
+        
+        # scale ครั้งเดียวต่อ scaler (โมเดลที่ใช้ scaler ร่วมกันได้ผลเดียวกัน)
+        scaled_inputs = {}
+        for model_name in member_names:
+            scaler = scalers[model_name]
+            if id(scaler) not in scaled_inputs:
                 try:
-                    scaler = scalers[model_name]
-                    model = models[model_name]
-                    
-                    # Ensure feature alignment before scaling
-                    X_test_aligned = self.feature_manager.align_features(X_test, method='pad_zeros')
-                    X_test_scaled = scaler.transform(X_test_aligned)
-                    predictions = (model.predict(X_test_scaled) == -1).astype(int)
-                    
-                    ensemble_predictions += predictions * weight
-                    successful_predictions += 1
-                    
+                    scaled_inputs[id(scaler)] = self._apply_scaler(scaler, X_test)
                 except Exception as e:
-                    logger.warning(f"Error in ensemble prediction for {model_name}: {e}")
-                    continue
+                    logger.warning(f"Error scaling ensemble input for {model_name}: {e}")
+                    scaled_inputs[id(scaler)] = None
+        
+        # โมเดลแต่ละตัวเป็นอิสระต่อกัน - ทำนายพร้อมกันด้วย threading backend
+        # (predict ของ sklearn ปล่อย GIL ระหว่างคำนวณใน C/Cython)
+        member_results = Parallel(n_jobs=max(1, len(member_names)), backend='threading')(
+            delayed(self._run_member)(model_name, models[model_name], scaled_inputs[id(scalers[model_name])])
+            for model_name in member_names
+        )
+        
+        # รวมผลเป็นเมทริกซ์ int8 (n_models, n_samples) แล้วโหวตด้วย dot product ครั้งเดียว
+        # โมเดลที่ทำนายไม่สำเร็จได้ weight = 0
+        member_predictions = np.zeros((len(member_names), len(X_test)), dtype=np.int8)
+        member_weights = np.zeros(len(member_names))
+        successful_predictions = 0
+        
+        for i, (model_name, predictions) in enumerate(zip(member_names, member_results)):
+            if predictions is None:
+                continue
+            
+            member_predictions[i] = predictions
+            member_weights[i] = self.ensemble_weights[model_name]
+            successful_predictions += 1
         
         if successful_predictions == 0:
             logger.error("ไม่สามารถใช้โมเดลใดๆ ใน ensemble ได้")
             return np.zeros(len(X_test))
         
+        ensemble_predictions = member_weights @ member_predictions
+        
         threshold = 0.3 if successful_predictions >= 3 else 0.4
         final_predictions = (ensemble_predictions >= threshold).astype(int)
         
         return final_predictions
     
+    def _run_member(self, model_name, model, X_test_scaled):
+        """ทำนายด้วยโมเดลหนึ่งตัวใน ensemble จากข้อมูลที่ scale แล้ว (predict + แปลงผล)"""
+        if X_test_scaled is None:
+            return None
+        
+        try:
+            return (self._model_predict(model, X_test_scaled) == -1).astype(np.int8)
+        
+        except Exception as e:
+            logger.warning(f"Error in ensemble prediction for {model_name}: {e}")
+            return None
+    
+    def _model_predict(self, model, X):
+        """model.predict - IsolationForest กับ batch ใหญ่ให้เดิน tree แบบ threads ตาม n_jobs ของโมเดล"""
+        # sklearn เดิน tree ด้วย Parallel ค่า default (sequential) ต้องเปิด backend เอง
+        # config ของ joblib เป็น thread-local จึงใช้ได้ภายใน threading Parallel ของ ensemble
+        if isinstance(model, IsolationForest) and len(X) >= self._threaded_tree_min_samples:
+            with joblib.parallel_backend('threading', n_jobs=model.n_jobs or 1):
+                return model.predict(X)
+        return model.predict(X)
+    
+    def _linear_scaler_arrays(self, scaler):
+        """(offset, scale) ของ StandardScaler / RobustScaler / MaxAbsScaler ใน dtype เดียวกับที่ sklearn ใช้
+        (StandardScaler แปลงเป็น float32 ตาม input, อีกสองชนิดใช้ float64) ผลจึงตรงกับ transform ทุกบิต
+        คืน None ถ้าเป็น scaler ชนิดอื่น (เช่น PowerTransformer) ที่ต้องใช้ scaler.transform"""
+        key = id(scaler)
+        with self._scaler_arrays_lock:
+            if key in self._scaler_arrays:
+                return self._scaler_arrays[key]
+        
+        try:
+            n_features = scaler.n_features_in_
+            offset = np.zeros(n_features)
+            scale = np.ones(n_features)
+            param_dtype = np.float64
+            
+            if type(scaler) is StandardScaler:
+                param_dtype = np.float32
+                if scaler.with_mean:
+                    offset = scaler.mean_
+                if scaler.with_std:
+                    scale = scaler.scale_
+            elif type(scaler) is RobustScaler:
+                if scaler.with_centering:
+                    offset = scaler.center_
+                if scaler.with_scaling:
+                    scale = scaler.scale_
+            elif type(scaler) is MaxAbsScaler and not getattr(scaler, 'clip', False):
+                scale = scaler.scale_
+            else:
+                offset = scale = None
+        except AttributeError:
+            # scaler ยังไม่ได้ fit - ให้ scaler.transform แจ้ง error ตามปกติ
+            return None
+        
+        arrays = None
+        if offset is not None:
+            arrays = (
+                np.ascontiguousarray(offset, dtype=param_dtype),
+                np.ascontiguousarray(scale, dtype=param_dtype)
+            )
+        
+        with self._scaler_arrays_lock:
+            self._scaler_arrays[key] = arrays
+        return arrays
+    
+    def _apply_scaler(self, scaler, X):
+        """scale X - scaler เชิงเส้นกับ input float32 คำนวณ (X - offset) / scale ตรงๆ ไม่ผ่าน validation ของ sklearn"""
+        arrays = None
+        if isinstance(X, np.ndarray) and X.dtype == np.float32 and X.ndim == 2:
+            arrays = self._linear_scaler_arrays(scaler)
+        
+        if arrays is None or X.shape[1] != len(arrays[1]):
+            return scaler.transform(X)
+        
+        # เขียนผลลง buffer float32 ทีละขั้นเหมือน X -= offset; X /= scale ของ sklearn
+        offset, scale = arrays
+        X_scaled = np.empty_like(X)
+        np.subtract(X, offset, out=X_scaled, casting='same_kind')
+        np.divide(X_scaled, scale, out=X_scaled, casting='same_kind')
+        return X_scaled
+    
+    def predict_anomalies_bulk(self, X_test, model_name='ensemble', chunk_size=None, n_workers=None):
+        """ทำนายข้อมูลจำนวนมากแบบแบ่ง chunk กระจายไปหลาย process
+        
+        โมเดลถูก dump ลงไฟล์ชั่วคราวครั้งเดียว แต่ละ worker โหลดแบบ mmap_mode='r'
+        จึงไม่ต้อง pickle forest ส่งไปใหม่ทุก chunk
+        """
+        if not isinstance(X_test, np.ndarray):
+            X_test = np.array(X_test)
+        
+        n_workers = n_workers or os.cpu_count() or 1
+        if chunk_size is None:
+            chunk_size = max(1024, len(X_test) // (4 * n_workers))
+        
+        # batch ไม่ถึงสอง chunk หรือมี worker เดียว - overhead ของการ dump โมเดลและ process pool ไม่คุ้ม
+        if n_workers <= 1 or len(X_test) < 2 * chunk_size:
+            return self.predict_anomalies(X_test, model_name)
+        
+        if model_name not in self.models:
+            raise ValueError(f"โมเดล {model_name} ยังไม่ได้เทรน")
+        
+        bundle = {
+            'models': {model_name: self.models[model_name]},
+            'scalers': {model_name: self.scalers[model_name]},
+            'ensemble_weights': self.ensemble_weights,
+            'feature_manager': self.feature_manager
+        }
+        chunks = [X_test[start:start + chunk_size] for start in range(0, len(X_test), chunk_size)]
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            bundle_path = os.path.join(tmp_dir, 'bulk_bundle.pkl')
+            joblib.dump(bundle, bundle_path)
+            
+            with ProcessPoolExecutor(max_workers=min(n_workers, len(chunks)),
+                                     initializer=_init_bulk_worker,
+                                     initargs=(bundle_path,)) as executor:
+                results = list(executor.map(_predict_bulk_chunk, chunks, [model_name] * len(chunks)))
+        
+        return np.concatenate(results)
+    
+    def _clear_scaler_arrays(self):
+        """ล้าง (offset, scale) ที่ดึงไว้เมื่อ scaler ถูกแทนที่ (เทรนใหม่/โหลดโมเดล)"""
+        with self._scaler_arrays_lock:
+            self._scaler_arrays.clear()
+    
     def save_models_enhanced(self, filepath_prefix="models/enhanced_anomaly_detection"):
         """บันทึกโมเดลขั้นสูง - รวม Feature Info"""
         logger.info("บันทึกโมเดลขั้นสูง v2.1 (Fixed)...")
@@ -584,15 +847,15 @@ class AnomalyDetectionModels:
         os.makedirs("models", exist_ok=True)
         
         try:
-            # บันทึกโมเดล
+            # บันทึกโมเดล - ไม่บีบอัด เพื่อให้ load_models ใช้ mmap_mode ได้
             for model_name, model in self.models.items():
                 model_path = f"{filepath_prefix}_{model_name}.pkl"
-                joblib.dump(model, model_path)
+                self._dump_replace(model, model_path)
                 logger.info(f"บันทึก {model_name} -> {model_path}")
             
             # บันทึก scalers
             scalers_path = f"{filepath_prefix}_scalers.pkl"
-            joblib.dump(self.scalers, scalers_path)
+            self._dump_replace(self.scalers, scalers_path)
             
             # บันทึก feature info และ configuration - รวม Feature Manager Info
             feature_info = {
@@ -609,7 +872,7 @@ class AnomalyDetectionModels:
             }
             
             feature_info_path = f"{filepath_prefix}_feature_info.pkl"
-            joblib.dump(feature_info, feature_info_path)
+            self._dump_replace(feature_info, feature_info_path)
             
             logger.info(f"บันทึก scalers -> {scalers_path}")
             logger.info(f"บันทึก feature info -> {feature_info_path}")
@@ -619,21 +882,58 @@ class AnomalyDetectionModels:
             logger.error(f"Error saving models: {e}")
             raise
     
+    def _dump_replace(self, obj, path):
+        """joblib.dump ลงไฟล์ชั่วคราวแล้วแทนที่ไฟล์เดิมแบบ atomic
+        
+        process ที่ mmap ไฟล์เดิมอยู่ยังอ่าน inode เดิมได้ - เขียนทับตรงๆ จะตัดไฟล์ที่ถูก map อยู่
+        """
+        tmp_path = f"{path}.tmp"
+        joblib.dump(obj, tmp_path, compress=0)
+        os.replace(tmp_path, path)
+    
     def load_models(self, filepath_prefix="models/anomaly_detection"):
         """โหลดโมเดลขั้นสูง - รวม Feature Alignment Setup"""
         logger.info("โหลดโมเดลขั้นสูง v2.1 (Fixed)...")
         
+        self._clear_scaler_arrays()
+        
         try:
-            # โหลด scalers
             scalers_path = f"{filepath_prefix}_scalers.pkl"
+            feature_info_path = f"{filepath_prefix}_feature_info.pkl"
+            model_names = ['isolation_forest', 'one_class_svm', 'local_outlier_factor', 
+                          'elliptic_envelope', 'ensemble']
+            
+            # อ่านไฟล์ทั้งหมดพร้อมกันด้วย threads (I/O และ mmap ปล่อย GIL) แล้วค่อยกระจายผลตามลำดับเดิม
+            load_jobs = {}
             if os.path.exists(scalers_path):
-                self.scalers = joblib.load(scalers_path)
+                load_jobs['scalers'] = (scalers_path, None)
+            if os.path.exists(feature_info_path):
+                load_jobs['feature_info'] = (feature_info_path, None)
+            for model_name in model_names:
+                model_path = f"{filepath_prefix}_{model_name}.pkl"
+                if os.path.exists(model_path):
+                    # mmap_mode='r' - array ของโมเดลอยู่ใน page cache ใช้ร่วมกันได้ทุก worker process
+                    load_jobs[model_name] = (model_path, 'r')
+            
+            load_results = dict(zip(load_jobs, Parallel(n_jobs=max(1, len(load_jobs)), backend='threading')(
+                delayed(self._load_file)(path, mmap_mode) for path, mmap_mode in load_jobs.values()
+            )))
+            
+            # โหลด scalers
+            if 'scalers' in load_results:
+                scalers, error = load_results['scalers']
+                if error is not None:
+                    raise error
+                self.scalers = scalers
+                if isinstance(self.scalers.get('ensemble'), dict):
+                    self.scalers['ensemble'] = self._share_equal_scalers(self.scalers['ensemble'])
                 logger.info("โหลด scalers สำเร็จ")
             
             # โหลด feature info
-            feature_info_path = f"{filepath_prefix}_feature_info.pkl"
-            if os.path.exists(feature_info_path):
-                feature_info = joblib.load(feature_info_path)
+            if 'feature_info' in load_results:
+                feature_info, error = load_results['feature_info']
+                if error is not None:
+                    raise error
                 self.feature_columns = feature_info.get('feature_columns', self.feature_columns)
                 self.time_features = feature_info.get('time_features', self.time_features)
                 self.derived_features = feature_info.get('derived_features', [])
@@ -651,19 +951,20 @@ class AnomalyDetectionModels:
                 logger.info(f"โหลด feature info สำเร็จ (version {version})")
             
             # โหลดโมเดล
-            model_names = ['isolation_forest', 'one_class_svm', 'local_outlier_factor', 
-                          'elliptic_envelope', 'ensemble']
             loaded_models = 0
             
             for model_name in model_names:
-                model_path = f"{filepath_prefix}_{model_name}.pkl"
-                if os.path.exists(model_path):
-                    try:
-                        self.models[model_name] = joblib.load(model_path)
-                        loaded_models += 1
-                        logger.info(f"โหลด {model_name} สำเร็จ")
-                    except Exception as e:
-                        logger.warning(f"ไม่สามารถโหลด {model_name}: {e}")
+                if model_name not in load_results:
+                    continue
+                
+                model, error = load_results[model_name]
+                if error is not None:
+                    logger.warning(f"ไม่สามารถโหลด {model_name}: {error}")
+                    continue
+                
+                self.models[model_name] = model
+                loaded_models += 1
+                logger.info(f"โหลด {model_name} สำเร็จ")
             
             if loaded_models == 0:
                 raise FileNotFoundError("ไม่พบไฟล์โมเดลใดๆ")
@@ -675,43 +976,150 @@ class AnomalyDetectionModels:
             logger.error(f"ไม่สามารถโหลดโมเดลได้: {e}")
             raise
     
+    @staticmethod
+    def _load_file(path, mmap_mode=None):
+        """joblib.load หนึ่งไฟล์ - คืน (object, error) เพื่อให้ผู้เรียกจัดการ error ตามชนิดไฟล์"""
+        try:
+            return joblib.load(path, mmap_mode=mmap_mode), None
+        except Exception as e:
+            return None, e
+    
+    def _split_training_data(self, X_train, y_train):
+        """ทำความสะอาด X_train แล้วแยกแถวปกติ (y == 0) พร้อม contamination rate"""
+        X_train_clean = self.clean_data_for_training(X_train)
+        y_train = np.asarray(y_train)
+        
+        X_normal = X_train_clean[y_train == 0]
+        contamination_rate = np.count_nonzero(y_train == 1) / len(y_train)
+        
+        return X_train_clean, X_normal, contamination_rate
+    
+    @staticmethod
+    def _scaler_state_equal(scaler_a, scaler_b):
+        """ตรวจว่า scaler สองตัว fit แล้วได้ state เดียวกัน (ชนิด, params และ attribute ที่เรียนรู้)"""
+        if type(scaler_a) is not type(scaler_b):
+            return False
+        
+        state_a, state_b = vars(scaler_a), vars(scaler_b)
+        if state_a.keys() != state_b.keys():
+            return False
+        
+        for key, value_a in state_a.items():
+            value_b = state_b[key]
+            if isinstance(value_a, np.ndarray) or isinstance(value_b, np.ndarray):
+                if not np.array_equal(value_a, value_b):
+                    return False
+            elif value_a != value_b:
+                return False
+        
+        return True
+    
+    def _share_equal_scalers(self, scalers_dict):
+        """ให้โมเดลใน ensemble ที่ scaler มี state เหมือนกันใช้ object เดียวกัน - ตอนทำนาย scale ครั้งเดียวต่อกลุ่ม"""
+        shared = {}
+        distinct = []
+        
+        for model_name, scaler in scalers_dict.items():
+            for candidate in distinct:
+                if self._scaler_state_equal(candidate, scaler):
+                    scaler = candidate
+                    break
+            else:
+                distinct.append(scaler)
+            shared[model_name] = scaler
+        
+        return shared
+    
+    def _fit_scaler_inplace(self, scaler, X_normal):
+        """Fit scaler แล้ว transform X_normal แบบ in-place (X_normal ต้องเป็น array ใหม่ที่ไม่ได้ใช้ร่วมกับที่อื่น)"""
+        self._clear_scaler_arrays()
+        scaler.set_params(copy=False)
+        X_normal_scaled = scaler.fit_transform(X_normal)
+        
+        # ตอน inference input ถูกใช้ร่วมกันทุกโมเดลใน ensemble จึงต้องให้ transform คัดลอกตามปกติ
+        scaler.set_params(copy=True)
+        return X_normal_scaled
+    
+    def _fit_standard_scaler(self, X_normal, training_split=None):
+        """Fit StandardScaler บน X_normal - ระหว่างเทรน ensemble (มี training_split) fit ครั้งเดียวแล้วใช้ร่วมกัน
+        ผลที่ใช้ร่วมกันเป็น read-only เพื่อไม่ให้โมเดลใดแก้ไขข้อมูลของอีกโมเดล"""
+        if training_split is None:
+            scaler = StandardScaler()
+            return scaler, self._fit_scaler_inplace(scaler, X_normal)
+        
+        # lock ครอบการ fit ด้วย - trainer ที่มาทีหลังรอใช้ผลเดียวกันแทนที่จะ fit ซ้ำ
+        with self._prep_normal_lock:
+            cached = self._prep_normal_cache.get(id(X_normal))
+            if cached is None or cached[0] is not X_normal:
+                scaler = StandardScaler()
+                X_normal_scaled = self._fit_scaler_inplace(scaler, X_normal.copy())
+                X_normal_scaled.flags.writeable = False
+                cached = (X_normal, scaler, X_normal_scaled)
+                self._prep_normal_cache[id(X_normal)] = cached
+        
+        return cached[1], cached[2]
+    
     # Training methods with feature alignment
-    def train_isolation_forest_enhanced(self, X_train, y_train):
+    def train_isolation_forest_enhanced(self, X_train, y_train, training_split=None):
         """เทรน Enhanced Isolation Forest - รวม Feature Alignment"""
         logger.info("เทรน Enhanced Isolation Forest v2.1 (Fixed)...")
         
-        # ทำความสะอาดและ align features
-        X_train_clean = self.clean_data_for_training(X_train)
-        X_normal = X_train_clean[y_train == 0]
+        # ทำความสะอาดและ align features (ใช้ผลที่ ensemble เตรียมไว้แล้วถ้ามี)
+        X_train_clean, X_normal, contamination_rate = training_split or self._split_training_data(X_train, y_train)
         
-        # ใช้ PowerTransformer เพื่อทำให้ข้อมูลเป็น Gaussian
-        scaler = PowerTransformer(method='yeo-johnson', standardize=True)
+        # Isolation Forest สุ่มจุดตัดภายในช่วงของแต่ละ feature จึงไม่ขึ้นกับ scale
+        # ใช้ MaxAbsScaler (ผ่านข้อมูลรอบเดียว) แทน PowerTransformer ที่ต้อง optimize lambda ทุก feature
+        scaler = MaxAbsScaler()
+        X_normal_scaled = self._fit_scaler_inplace(scaler, X_normal.copy() if training_split else X_normal)
         
-        try:
-            X_normal_scaled = scaler.fit_transform(X_normal)
-        except Exception as e:
-            logger.warning(f"PowerTransformer failed, using StandardScaler: {e}")
-            scaler = StandardScaler()
-            X_normal_scaled = scaler.fit_transform(X_normal)
+        # tree ของ sklearn ทำงานบน float32 - ป้อน float32 แบบ contiguous เพื่อไม่ให้ fit/predict ต้องแปลงซ้ำ
+        X_normal_scaled = np.ascontiguousarray(X_normal_scaled, dtype=np.float32)
         
         # ปรับ hyperparameters ตาม contamination rate
-        contamination_rate = len(y_train[y_train == 1]) / len(y_train)
-        
         model_params = self.model_config['isolation_forest'].copy()
         model_params['contamination'] = min(0.2, max(0.05, contamination_rate * 0.9))
         
-        model = IsolationForest(
-            contamination=model_params['contamination'],
-            random_state=model_params['random_state'],
-            n_estimators=model_params['n_estimators'],
-            max_samples=model_params['max_samples'],
-            max_features=model_params['max_features'],
-            bootstrap=True,
-            n_jobs=-1,
-            warm_start=False
-        )
+        # scikit-learn >= 1.3 (ดู requirements.txt) คำนวณ average path length ของแต่ละ tree
+        # ไว้ตั้งแต่ตอน fit และ predict เดิน tree รอบเดียว - ไม่ต้อง patch _compute_score_samples เอง
+        max_estimators = model_params['n_estimators']
+        tree_step = 50
+        
+        def make_forest(n_estimators, warm_start=False):
+            return IsolationForest(
+                contamination=model_params['contamination'],
+                random_state=model_params['random_state'],
+                n_estimators=n_estimators,
+                max_samples=model_params['max_samples'],
+                max_features=model_params['max_features'],
+                bootstrap=True,
+                n_jobs=model_params.get('n_jobs', -1),
+                warm_start=warm_start
+            )
         
-        model.fit(X_normal_scaled)
+        # เลือกจำนวน tree: แยกแถวปกติส่วนหนึ่งไว้เป็น validation (ร่วมกับแถวผิดปกติ) แล้วเพิ่ม tree ทีละ tree_step
+        # (warm_start เก็บ tree เดิมไว้) จนกว่า ROC-AUC บน validation จะดีขึ้นไม่ถึง 0.002 - step สุดท้ายนั้นไม่นับ
+        # tree น้อยลง = predict ใน ensemble เร็วขึ้นตามสัดส่วน
+        n_estimators = max_estimators
+        best_auc = None
+        X_fit, X_eval, y_eval = self._tree_growth_split(X_train_clean, y_train, X_normal_scaled, scaler)
+        if X_eval is not None:
+            growth_model = make_forest(min(tree_step, max_estimators), warm_start=True).fit(X_fit)
+            best_auc = roc_auc_score(y_eval, -growth_model.score_samples(X_eval))
+            while growth_model.n_estimators < max_estimators:
+                previous_estimators = growth_model.n_estimators
+                growth_model.n_estimators = min(previous_estimators + tree_step, max_estimators)
+                growth_model.fit(X_fit)
+                
+                auc = roc_auc_score(y_eval, -growth_model.score_samples(X_eval))
+                if auc - best_auc < 0.002:
+                    break
+                best_auc = auc
+            else:
+                previous_estimators = growth_model.n_estimators
+            n_estimators = previous_estimators
+        
+        # โมเดลจริง fit ใหม่บนแถวปกติทั้งหมด (รวม validation) ด้วยจำนวน tree ที่เลือก
+        model = make_forest(n_estimators).fit(X_normal_scaled)
         
         self.models['isolation_forest'] = model
         self.scalers['isolation_forest'] = scaler
@@ -719,46 +1127,78 @@ class AnomalyDetectionModels:
         # บันทึก performance
         self.model_performance['isolation_forest'] = {
             'contamination': model_params['contamination'],
-            'n_estimators': model_params['n_estimators'],
+            'n_estimators': model.n_estimators,
+            'validation_auc': best_auc,
             'training_samples': len(X_normal_scaled),
             'feature_count': X_normal_scaled.shape[1]
         }
         
-        logger.info(f"Enhanced Isolation Forest เทรนเสร็จสิ้น (contamination: {model_params['contamination']:.3f})")
+        logger.info(f"Enhanced Isolation Forest เทรนเสร็จสิ้น (contamination: {model_params['contamination']:.3f}, "
+                    f"trees: {model.n_estimators})")
         return model, scaler
     
-    def train_one_class_svm_enhanced(self, X_train, y_train):
+    def _tree_growth_split(self, X_train_clean, y_train, X_normal_scaled, scaler,
+                           holdout_fraction=0.2, max_samples=5000):
+        """แบ่งแถวปกติ (scaled) เป็นชุด fit และ holdout แล้วรวม holdout กับแถวผิดปกติเป็น validation (ใช้เลือกจำนวน tree)
+        คืน (X_fit, X_eval, y_eval) - X_eval/y_eval เป็น None ถ้าไม่มีแถวผิดปกติหรือแถวปกติน้อยเกินไป"""
+        y_train = np.asarray(y_train)
+        n_normal = len(X_normal_scaled)
+        n_holdout = min(int(n_normal * holdout_fraction), max_samples)
+        if not np.any(y_train == 1) or n_holdout < 1 or n_normal - n_holdout < 2:
+            return X_normal_scaled, None, None
+        
+        rng = np.random.RandomState(42)
+        order = rng.permutation(n_normal)
+        X_fit = X_normal_scaled[np.sort(order[n_holdout:])]
+        
+        X_anomaly = X_train_clean[y_train == 1]
+        if len(X_anomaly) > max_samples:
+            X_anomaly = X_anomaly[rng.choice(len(X_anomaly), max_samples, replace=False)]
+        
+        X_eval = np.concatenate([
+            X_normal_scaled[order[:n_holdout]],
+            np.asarray(scaler.transform(X_anomaly), dtype=np.float32)
+        ])
+        y_eval = np.concatenate([np.zeros(n_holdout, dtype=int), np.ones(len(X_anomaly), dtype=int)])
+        return X_fit, X_eval, y_eval
+    
+    def train_one_class_svm_enhanced(self, X_train, y_train, training_split=None):
         """เทรน Enhanced One-Class SVM - รวม Feature Alignment"""
         logger.info("เทรน Enhanced One-Class SVM v2.1 (Fixed)...")
         
-        # ทำความสะอาดและ align features
-        X_train_clean = self.clean_data_for_training(X_train)
-        X_normal = X_train_clean[y_train == 0]
+        # ทำความสะอาดและ align features (ใช้ผลที่ ensemble เตรียมไว้แล้วถ้ามี)
+        X_train_clean, X_normal, contamination_rate = training_split or self._split_training_data(X_train, y_train)
         
         # ใช้ RobustScaler เพื่อจัดการ outliers
         scaler = RobustScaler(quantile_range=(10, 90))
-        X_normal_scaled = scaler.fit_transform(X_normal)
+        X_normal_scaled = self._fit_scaler_inplace(scaler, X_normal.copy() if training_split else X_normal)
         
         # ปรับ hyperparameters
-        contamination_rate = len(y_train[y_train == 1]) / len(y_train)
-        
         model_params = self.model_config['one_class_svm'].copy()
         model_params['nu'] = min(0.2, max(0.05, contamination_rate * 0.8))
         
-        # ปรับ gamma ตามขนาดข้อมูล
+        # ปรับ gamma ตามขนาดข้อมูล - ข้อมูลใหญ่ใช้ค่า 'scale' ของ SVC (variance เป็น 0 ใช้ 1.0 เหมือน SVC)
         if len(X_normal) > 5000:
-            model_params['gamma'] = 'scale'
+            X_var = float(X_normal_scaled.var())
+            model_params['gamma'] = 1.0 / (X_normal_scaled.shape[1] * X_var) if X_var > 0 else 1.0
         else:
             model_params['gamma'] = 0.1
         
-        model = OneClassSVM(
-            kernel=model_params['kernel'],
-            gamma=model_params['gamma'],
-            nu=model_params['nu'],
-            shrinking=model_params['shrinking'],
-            tol=1e-4,
-            cache_size=1000
-        )
+        if len(X_normal) > 5000 and model_params.get('approximate_kernel', False):
+            # libsvm ใช้เวลา O(N^2)-O(N^3) - เลือกใช้ Nystroem (ประมาณ RBF kernel) + linear SGD แทนได้
+            model = make_pipeline(
+                Nystroem(kernel=model_params['kernel'], gamma=model_params['gamma'], n_components=200, random_state=42),
+                SGDOneClassSVM(nu=model_params['nu'], random_state=42)
+            )
+        else:
+            model = OneClassSVM(
+                kernel=model_params['kernel'],
+                gamma=model_params['gamma'],
+                nu=model_params['nu'],
+                shrinking=model_params['shrinking'],
+                tol=1e-4,
+                cache_size=1000
+            )
         
         model.fit(X_normal_scaled)
         
@@ -776,16 +1216,14 @@ class AnomalyDetectionModels:
         logger.info(f"Enhanced One-Class SVM เทรนเสร็จสิ้น (nu: {model_params['nu']:.3f})")
         return model, scaler
     
-    def train_local_outlier_factor(self, X_train, y_train):
+    def train_local_outlier_factor(self, X_train, y_train, training_split=None):
         """เทรน Local Outlier Factor - รวม Feature Alignment"""
         logger.info("เทรน Local Outlier Factor v2.1 (Fixed)...")
         
-        # ทำความสะอาดและ align features
-        X_train_clean = self.clean_data_for_training(X_train)
-        X_normal = X_train_clean[y_train == 0]
+        # ทำความสะอาดและ align features (ใช้ผลที่ ensemble เตรียมไว้แล้วถ้ามี)
+        X_train_clean, X_normal, contamination_rate = training_split or self._split_training_data(X_train, y_train)
         
-        scaler = StandardScaler()
-        X_normal_scaled = scaler.fit_transform(X_normal)
+        scaler, X_normal_scaled = self._fit_standard_scaler(X_normal, training_split)
         
         # ปรับ n_neighbors ตามขนาดข้อมูล
         n_samples = len(X_normal)
@@ -794,20 +1232,30 @@ class AnomalyDetectionModels:
         else:
             n_neighbors = min(50, max(20, int(np.sqrt(n_samples))))
         
-        contamination_rate = len(y_train[y_train == 1]) / len(y_train)
-        
-        model = LocalOutlierFactor(
-            n_neighbors=n_neighbors,
-            contamination=min(0.2, max(0.05, contamination_rate)),
-            novelty=True,
-            algorithm='auto',
-            leaf_size=30,
-            metric='minkowski',
-            p=2,
-            n_jobs=-1
-        )
-        
-        model.fit(X_normal_scaled)
+        contamination = min(0.2, max(0.05, contamination_rate))
+        
+        # LOF fit แบบ deterministic - ข้อมูลและ params เดิมได้โมเดลเดิม จึงใช้ตัวที่ fit ไว้แล้วได้
+        X_normal_scaled = np.ascontiguousarray(X_normal_scaled)
+        digest = hashlib.blake2b(X_normal_scaled, digest_size=16).hexdigest()
+        cache_key = (X_normal_scaled.shape, X_normal_scaled.dtype.str, digest, n_neighbors, contamination)
+        model = self._lof_cache.get(cache_key)
+        
+        if model is None:
+            model = LocalOutlierFactor(
+                n_neighbors=n_neighbors,
+                contamination=contamination,
+                novelty=True,
+                algorithm='auto',
+                leaf_size=30,
+                metric='minkowski',
+                p=2,
+                n_jobs=-1
+            )
+            
+            model.fit(X_normal_scaled)
+            self._lof_cache = {cache_key: model}
+        else:
+            logger.info("ใช้ Local Outlier Factor ที่ fit ไว้แล้วบนข้อมูลชุดเดียวกัน")
         
         self.models['local_outlier_factor'] = model
         self.scalers['local_outlier_factor'] = scaler
@@ -823,18 +1271,14 @@ class AnomalyDetectionModels:
         logger.info(f"Local Outlier Factor เทรนเสร็จสิ้น (n_neighbors: {n_neighbors})")
         return model, scaler
     
-    def train_elliptic_envelope(self, X_train, y_train):
+    def train_elliptic_envelope(self, X_train, y_train, training_split=None):
         """เทรน Elliptic Envelope - รวม Feature Alignment"""
         logger.info("เทรน Elliptic Envelope v2.1 (Fixed)...")
         
-        # ทำความสะอาดและ align features
-        X_train_clean = self.clean_data_for_training(X_train)
-        X_normal = X_train_clean[y_train == 0]
+        # ทำความสะอาดและ align features (ใช้ผลที่ ensemble เตรียมไว้แล้วถ้ามี)
+        X_train_clean, X_normal, contamination_rate = training_split or self._split_training_data(X_train, y_train)
         
-        scaler = StandardScaler()
-        X_normal_scaled = scaler.fit_transform(X_normal)
-        
-        contamination_rate = len(y_train[y_train == 1]) / len(y_train)
+        scaler, X_normal_scaled = self._fit_standard_scaler(X_normal, training_split)
         
         # ปรับ support_fraction ตามขนาดข้อมูล
         support_fraction = None
@@ -864,41 +1308,47 @@ class AnomalyDetectionModels:
         logger.info("Elliptic Envelope เทรนเสร็จสิ้น")
         return model, scaler
     
+    def _train_member(self, label, trainer, X_train, y_train, training_split):
+        """เทรนโมเดลหนึ่งตัวใน ensemble - คืน (model, scaler) หรือ None ถ้าเทรนไม่สำเร็จ"""
+        try:
+            return trainer(X_train, y_train, training_split)
+        except Exception as e:
+            logger.error(f"Failed to train {label}: {e}")
+            return None
+    
     def train_ensemble_model(self, X_train, y_train):
         """เทรน Advanced Ensemble Model - รวม Feature Alignment"""
         logger.info("เทรน Advanced Ensemble Model v2.1 (Fixed)...")
         
-        # เทรนโมเดลทั้งหมด
+        # เทรนโมเดลทั้งหมด - ทำความสะอาดและแยกแถวปกติครั้งเดียว ใช้ร่วมกันทุกโมเดล
         models_dict = {}
         scalers_dict = {}
+        training_split = self._split_training_data(X_train, y_train)
+        
+        # โมเดลทั้งสี่เป็นอิสระต่อกัน - เทรนพร้อมกันด้วย threading backend
+        # (fit ของ sklearn ส่วนใหญ่อยู่ใน C/Cython/BLAS ที่ปล่อย GIL และ trainer แต่ละตัวเขียน self.models ด้วย key ของตัวเอง)
+        member_trainers = [
+            ('isolation_forest', 'Isolation Forest', self.train_isolation_forest_enhanced),
+            ('one_class_svm', 'One-Class SVM', self.train_one_class_svm_enhanced),
+            ('local_outlier_factor', 'LOF', self.train_local_outlier_factor),
+            ('elliptic_envelope', 'Elliptic Envelope', self.train_elliptic_envelope)
+        ]
+        n_jobs = max(1, min(len(member_trainers), os.cpu_count() or 1))
+        member_results = Parallel(n_jobs=n_jobs, backend='threading')(
+            delayed(self._train_member)(label, trainer, X_train, y_train, training_split)
+            for _, label, trainer in member_trainers
+        )
         
-        try:
-            if_model, if_scaler = self.train_isolation_forest_enhanced(X_train, y_train)
-            models_dict['isolation_forest'] = if_model
-            scalers_dict['isolation_forest'] = if_scaler
-        except Exception as e:
-            logger.error(f"Failed to train Isolation Forest: {e}")
-        
-        try:
-            svm_model, svm_scaler = self.train_one_class_svm_enhanced(X_train, y_train)
-            models_dict['one_class_svm'] = svm_model
-            scalers_dict['one_class_svm'] = svm_scaler
-        except Exception as e:
-            logger.error(f"Failed to train One-Class SVM: {e}")
-        
-        try:
-            lof_model, lof_scaler = self.train_local_outlier_factor(X_train, y_train)
-            models_dict['local_outlier_factor'] = lof_model
-            scalers_dict['local_outlier_factor'] = lof_scaler
-        except Exception as e:
-            logger.error(f"Failed to train LOF: {e}")
+        for (model_name, _, _), result in zip(member_trainers, member_results):
+            if result is None:
+                continue
+            
+            models_dict[model_name], scalers_dict[model_name] = result
         
-        try:
-            ee_model, ee_scaler = self.train_elliptic_envelope(X_train, y_train)
-            models_dict['elliptic_envelope'] = ee_model
-            scalers_dict['elliptic_envelope'] = ee_scaler
-        except Exception as e:
-            logger.error(f"Failed to train Elliptic Envelope: {e}")
+        # ผล scaling ที่ใช้ร่วมกันและ LOF ที่แคชไว้หมดหน้าที่แล้ว - ไม่ถือ array ขนาดใหญ่ไว้
+        with self._prep_normal_lock:
+            self._prep_normal_cache.clear()
+        self._lof_cache = {}
         
         if not models_dict:
             raise ValueError("ไม่สามารถเทรนโมเดลใดๆ ได้")
@@ -912,7 +1362,7 @@ class AnomalyDetectionModels:
             adjusted_weights[model] = self.ensemble_weights[model] / total_weight
         
         self.models['ensemble'] = models_dict
-        self.scalers['ensemble'] = scalers_dict
+        self.scalers['ensemble'] = self._share_equal_scalers(scalers_dict)
         self.ensemble_weights = adjusted_weights
         
         logger.info(f"Advanced Ensemble Model เทรนเสร็จสิ้น ({len(models_dict)} โมเดล)")
@@ -943,6 +1393,8 @@ class AnomalyDetectionModels:
         logger.info(f"ประเมิน model {model_name} v2.1 (Fixed)...")
         
         try:
+            y_proba = None
+            
             # ✅ FIX: Handle supervised models separately
             if model_name in ['random_forest', 'gradient_boosting']:
                 # Supervised models prediction
@@ -960,20 +1412,26 @@ class AnomalyDetectionModels:
                 # Clean and align features
                 X_test_clean = self.clean_data_for_training(X_test)
                 
-                # Predict directly (supervised models already return 0/1)
-                y_pred = model.predict(X_test_clean)
+                if hasattr(model, 'predict_proba'):
+                    # เดินต้นไม้ครั้งเดียว: ได้ทั้ง label (argmax แบบเดียวกับ predict) และ score สำหรับ AUC
+                    proba = model.predict_proba(X_test_clean)
+                    y_pred = model.classes_.take(np.argmax(proba, axis=1))
+                    y_proba = proba[:, 1]
+                else:
+                    # Predict directly (supervised models already return 0/1)
+                    y_pred = model.predict(X_test_clean)
                 
             else:
                 # Unsupervised models prediction (original code)
                 y_pred = self.predict_anomalies(X_test, model_name)
             
-            # Calculate metrics (same for both types)
+            # Calculate metrics (same for both types) - คำนวณ report ครั้งเดียว แล้วจัดรูปแบบจาก dict
             report = classification_report(y_test, y_pred, output_dict=True, zero_division=0)
             logger.info(f"\nClassification Report for {model_name}:")
-            print(classification_report(y_test, y_pred, zero_division=0))
+            print(self._format_classification_report(report))
             
             # Confusion Matrix
-            cm = confusion_matrix(y_test, y_pred)
+            cm = self._binary_confusion_matrix(y_test, y_pred)
             logger.info(f"\nConfusion Matrix:")
             print(cm)
             
@@ -997,15 +1455,13 @@ class AnomalyDetectionModels:
             # ROC AUC Score
             auc_score = None
             try:
-                if len(np.unique(y_test)) > 1 and len(np.unique(y_pred)) > 1:
-                    # Try to get probability scores if available
-                    if model_name in ['random_forest', 'gradient_boosting']:
-                        if hasattr(self.models[model_name], 'predict_proba'):
-                            X_test_clean = self.clean_data_for_training(X_test)
-                            y_proba = self.models[model_name].predict_proba(X_test_clean)[:, 1]
-                            auc_score = roc_auc_score(y_test, y_proba)
-                        else:
-                            auc_score = roc_auc_score(y_test, y_pred)
+                # ทั้ง y_test และ y_pred มีครบสองคลาส - ดูจาก confusion matrix แทน np.unique
+                both_true_classes = (tn + fp) > 0 and (fn + tp) > 0
+                both_pred_classes = (tn + fn) > 0 and (fp + tp) > 0
+                if both_true_classes and both_pred_classes:
+                    # Use probability scores if available
+                    if y_proba is not None:
+                        auc_score = roc_auc_score(y_test, y_proba)
                     else:
                         auc_score = roc_auc_score(y_test, y_pred)
                     
@@ -1039,7 +1495,7 @@ class AnomalyDetectionModels:
             return {
                 'predictions': dummy_pred,
                 'true_labels': y_test,
-                'confusion_matrix': confusion_matrix(y_test, dummy_pred),
+                'confusion_matrix': self._binary_confusion_matrix(y_test, dummy_pred),
                 'classification_report': {'accuracy': 0},
                 'specificity': 0,
                 'sensitivity': 0,
@@ -1049,47 +1505,95 @@ class AnomalyDetectionModels:
                 'error': str(e)
             }
     
+    @staticmethod
+    def _binary_confusion_matrix(y_true, y_pred):
+        """confusion matrix 2x2 (label 0/1) ด้วย np.bincount - ผ่านข้อมูลรอบเดียว ไม่ผ่าน label validation ของ sklearn"""
+        y_true = np.asarray(y_true).ravel()
+        y_pred = np.asarray(y_pred).ravel()
+        if y_true.size and np.isin(y_true, (0, 1)).all() and np.isin(y_pred, (0, 1)).all():
+            codes = 2 * y_true.astype(np.int8) + y_pred.astype(np.int8)
+            return np.bincount(codes, minlength=4).reshape(2, 2)
+        # label ไม่ใช่ 0/1 - ใช้ sklearn ตามเดิม
+        return confusion_matrix(y_true, y_pred)
+    
+    def _format_classification_report(self, report, digits=2):
+        """จัดรูปแบบ classification report (output_dict=True) เป็นข้อความแบบเดียวกับ sklearn"""
+        headers = ['precision', 'recall', 'f1-score', 'support']
+        width = max(len('weighted avg'), max(len(str(label)) for label in report))
+        row_fmt = '{:>{width}} ' + ' {:>9.{digits}f}' * 3 + ' {:>9}'
+        lines = ['{:>{width}} '.format('', width=width) + ''.join(f" {header:>9}" for header in headers), '']
+        
+        for label, metrics in report.items():
+            if label == 'accuracy':
+                continue
+            if label == 'macro avg' and 'accuracy' in report:
+                lines.append('')
+                total = int(metrics['support'])
+                lines.append('{:>{width}} '.format('accuracy', width=width) + ' ' * 20 +
+                             ' {:>9.{digits}f} {:>9}'.format(report['accuracy'], total, digits=digits))
+            lines.append(row_fmt.format(label, metrics['precision'], metrics['recall'], metrics['f1-score'],
+                                        int(metrics['support']), width=width, digits=digits))
+        
+        return '\n'.join(lines)
+    
     def evaluate_model(self, X_test, y_test, model_name='ensemble'):
         """ประเมินประสิทธิภาพโมเดล (backward compatibility)"""
         return self.evaluate_model_enhanced(X_test, y_test, model_name)
 
+# Detector ของแต่ละ worker process ใน predict_anomalies_bulk (โหลดครั้งเดียวต่อ process)
+_bulk_worker_detector = None
+
+def _init_bulk_worker(bundle_path):
+    """โหลดโมเดลจากไฟล์ชั่วคราวแบบ memory-mapped สำหรับ worker process"""
+    global _bulk_worker_detector
+    bundle = joblib.load(bundle_path, mmap_mode='r')
+    
+    detector = AnomalyDetectionModels()
+    detector.models = bundle['models']
+    detector.scalers = bundle['scalers']
+    detector.ensemble_weights = bundle['ensemble_weights']
+    detector.feature_manager = bundle['feature_manager']
+    # ขนานกันที่ระดับ process อยู่แล้ว - ไม่แตก threads เดิน tree ซ้อนอีกชั้น
+    detector._threaded_tree_min_samples = float('inf')
+    _bulk_worker_detector = detector
+
+def _predict_bulk_chunk(X_chunk, model_name):
+    """ทำนาย chunk หนึ่งใน worker process"""
+    return _bulk_worker_detector.predict_anomalies(X_chunk, model_name)
+
 class RuleBasedAnomalyDetector:
     """Rule-based detector ที่ปรับปรุงแล้ว v2.1"""
     
-    def __init__(self):
+    def __init__(self, debounce_window=1):
+        # กฎที่ไม่มี 'condition' ประเมินรวมกันใน _evaluate_mask (bit ตามลำดับใน dict นี้)
+        # กฎที่ต้องใช้ประวัติ (sensor_failure, gradual_drift) และกฎที่เพิ่มเองเรียก condition ทีละ record
         self.rules = {
             'sudden_drop': {
-                'condition': self._check_sudden_drop,
                 'alert_level': 'red',
                 'message': "ค่าเซนเซอร์ลดลงกะทันหัน ตรวจสอบระบบทันที",
                 'priority': 3
             },
             'sudden_spike': {
-                'condition': self._check_sudden_spike,
                 'alert_level': 'yellow',
                 'message': "ค่าเซนเซอร์พุ่งสูงผิดปกติ กรุณาตรวจสอบ",
                 'priority': 2
             },
             'vpd_too_low': {
-                'condition': self._check_vpd_too_low,
                 'alert_level': 'red',
                 'message': "VPD ต่ำเกินไป เสี่ยงโรคพืช ตรวจสอบระบบระบายอากาศ",
                 'priority': 3
             },
             'low_voltage': {
-                'condition': self._check_low_voltage,
                 'alert_level': 'yellow',
                 'message': "แรงดันไฟต่ำ ตรวจสอบระบบไฟฟ้าและแบตเตอรี่",
                 'priority': 2
             },
             'dew_point_close': {
-                'condition': self._check_dew_point_close,
                 'alert_level': 'red',
                 'message': "จุดน้ำค้างใกล้อุณหภูมิ เสี่ยงเกิดเชื้อรา",
                 'priority': 3
             },
             'battery_depleted': {
-                'condition': self._check_battery_depleted,
                 'alert_level': 'red',
                 'message': "แบตเตอรี่หมด เปลี่ยนหรือชาร์จทันที",
                 'priority': 3
@@ -1101,13 +1605,11 @@ class RuleBasedAnomalyDetector:
                 'priority': 3
             },
             'high_fluctuation': {
-                'condition': self._check_high_fluctuation,
                 'alert_level': 'yellow',
                 'message': "ค่าผันผวนสูงผิดปกติ ตรวจสอบระบบ",
                 'priority': 2
             },
             'environmental_stress': {
-                'condition': self._check_environmental_stress,
                 'alert_level': 'yellow',
                 'message': "สภาพแวดล้อมไม่เหมาะสม อาจส่งผลต่อพืช",
                 'priority': 2
@@ -1120,27 +1622,142 @@ class RuleBasedAnomalyDetector:
             }
         }
         
-        # เพิ่ม thresholds ที่ปรับปรุงแล้ว
+        # เพิ่ม thresholds ที่ปรับปรุงแล้ว (สำเนาของค่าคงที่ระดับ module สำหรับแสดงผล - กฎอ่านจากค่าคงที่โดยตรง)
         self.thresholds = {
-            'vpd_critical': 0.3,
-            'vpd_warning': 0.5,
-            'dew_point_critical': 1.2,
-            'voltage_critical': 2.7,
-            'voltage_warning': 2.9,
-            'battery_critical': 12,
-            'battery_warning': 20,
-            'temp_change_critical': 10,
-            'temp_change_warning': 6,
-            'humidity_extreme_high': 96,
-            'humidity_extreme_low': 20,
-            'co2_critical_high': 2000,
-            'co2_warning_high': 1600
+            'vpd_critical': VPD_CRITICAL,
+            'vpd_warning': VPD_WARNING,
+            'dew_point_critical': DEW_POINT_CRITICAL,
+            'voltage_critical': VOLTAGE_CRITICAL,
+            'voltage_warning': VOLTAGE_WARNING,
+            'battery_critical': BATTERY_CRITICAL,
+            'battery_warning': BATTERY_WARNING,
+            'temp_change_critical': TEMP_CHANGE_CRITICAL,
+            'temp_change_warning': TEMP_CHANGE_WARNING,
+            'humidity_extreme_high': HUMIDITY_EXTREME_HIGH,
+            'humidity_extreme_low': HUMIDITY_EXTREME_LOW,
+            'co2_critical_high': CO2_CRITICAL_HIGH,
+            'co2_warning_high': CO2_WARNING_HIGH
         }
+        
+        # ค่าที่กฎแบบไม่ขึ้นกับประวัติใช้ - ดึงจาก dict ครั้งเดียวต่อ record เป็น vector ลำดับคงที่
+        self._rule_fields = ('temperature', 'humidity', 'vpd', 'dew_point', 'voltage', 'battery_level', 'co2')
+        
+        # bit ของแต่ละกฎใน mask = ลำดับของกฎใน self.rules
+        self._mask_bits = {
+            rule_name: bit for bit, (rule_name, rule_config) in enumerate(self.rules.items())
+            if 'condition' not in rule_config
+        }
+        
+        # (ตำแหน่งใน self._rule_fields, สัดส่วนการเปลี่ยนแปลงสูงสุด) ของกฎ high_fluctuation
+        self._fluctuation_limits = tuple(
+            (self._rule_fields.index(sensor), limit) for sensor, limit in FLUCTUATION_LIMITS
+        )
+        
+        # stream buffer สำหรับ push() - เก็บ (reading, ค่าตัวเลขที่ดึงแล้ว) ล่าสุด 16 ค่า (พอสำหรับกฎที่ใช้ประวัติ 8 จุด)
+        self._stream = deque(maxlen=16)
+        
+        # debounce สำหรับ stream: กฎต้องเกิดติดต่อกัน debounce_window reading ก่อนรายงาน (1 = รายงานทันทีแบบเดิม)
+        # นับต่อ (device_id, ชนิด anomaly) ตอน push - การเรียก detect_anomalies() ซ้ำกับ reading เดิมไม่นับเพิ่ม
+        self.debounce_window = max(1, int(debounce_window))
+        self._consecutive = defaultdict(int)
+        self._debounced_latest = []
+    
+    def push(self, reading):
+        """เพิ่ม reading ใหม่เข้า stream buffer แล้วเรียก detect_anomalies() แบบไม่ส่ง argument
+        
+        buffer ผูกกับ detector instance - แต่ละอุปกรณ์ควรใช้ detector ของตัวเอง
+        เมื่อ debounce_window > 1 จะประเมินกฎและนับ debounce ของ reading นี้ทันที (ตัวนับแยกตาม device_id ของ reading)
+        """
+        if not isinstance(reading, dict):
+            logger.warning(f"push() ต้องการ dict แต่ได้ {type(reading).__name__}")
+            return
+        
+        self._stream.append((reading, self._reading_values(reading)))
+        
+        if self.debounce_window > 1:
+            self._debounced_latest = self._debounce(reading.get('device_id'), self._evaluate_latest())
+    
+    def _reading_values(self, data):
+        """ดึงค่าตัวเลขตาม self._rule_fields จาก record ครั้งเดียว (None ถ้าไม่มี record)"""
+        if data is None:
+            return None
+        return tuple(self._safe_get_numeric_value(data, field) for field in self._rule_fields)
+    
+    def _evaluate_mask(self, current, previous):
+        """ประเมินกฎที่ไม่ขึ้นกับประวัติทั้งหมดในรอบเดียว คืนค่า bitmask (ตำแหน่ง bit ตาม self._mask_bits)
+        
+        current, previous: ผลจาก _reading_values (previous เป็น None ถ้าไม่มีข้อมูลก่อนหน้า)
+        """
+        bit = self._mask_bits
+        t, h, vpd, dp, v, bat, co2 = current
+        bits = 0
+        
+        if previous is not None:
+            pt, _, _, _, pv, pbat, _ = previous
+            
+            if ((t > 0 and pt > 0 and (pt - t > TEMP_CHANGE_CRITICAL or (pt - t) / pt > 0.25)) or
+                    (v > 0 and pv > 0 and (pv - v > 0.5 or (pv - v) / pv > 0.2)) or
+                    0 < v < VOLTAGE_CRITICAL):
+                bits |= 1 << bit['sudden_drop']
+            
+            if ((t > 0 and pt > 0 and t - pt > TEMP_CHANGE_CRITICAL) or
+                    t > 45 or v > 4.0 or co2 > CO2_CRITICAL_HIGH):
+                bits |= 1 << bit['sudden_spike']
+            
+            if pbat > 0 and bat > 0 and pbat - bat > 20:
+                bits |= 1 << bit['battery_depleted']
+            
+            fluctuation_count = 0
+            for index, limit in self._fluctuation_limits:
+                cur, prev = current[index], previous[index]
+                if cur > 0 and prev > 0 and abs(cur - prev) / prev > limit:
+                    fluctuation_count += 1
+            if fluctuation_count >= 2:
+                bits |= 1 << bit['high_fluctuation']
+        
+        valid_climate = t > 0 and 0 < h <= 100
+        
+        if 0 < vpd < VPD_CRITICAL:
+            bits |= 1 << bit['vpd_too_low']
+        elif valid_climate:
+            calculated_vpd = magnus_vpd(t, h)
+            if 0 < calculated_vpd < VPD_CRITICAL:
+                bits |= 1 << bit['vpd_too_low']
+        
+        if 0 < v < VOLTAGE_WARNING or (0 < v < 3.0 and 0 < bat < 30):
+            bits |= 1 << bit['low_voltage']
+        
+        if (t > 0 and dp > 0 and t - dp < DEW_POINT_CRITICAL) or (h > 95 and t < 25):
+            bits |= 1 << bit['dew_point_close']
+        elif valid_climate:
+            calculated_dew_point = magnus_dew_point(t, h)
+            if t - calculated_dew_point < DEW_POINT_CRITICAL:
+                bits |= 1 << bit['dew_point_close']
+        
+        if 0 < bat < BATTERY_CRITICAL or 0 < v < 2.3:
+            bits |= 1 << bit['battery_depleted']
+        
+        stress_factors = (
+            (h > HUMIDITY_EXTREME_HIGH and t < 18) +
+            (h < HUMIDITY_EXTREME_LOW and t > 38) +
+            (0 < vpd < VPD_WARNING) +
+            (co2 > CO2_WARNING_HIGH) +
+            (t > 42 or t < 8)
+        )
+        if stress_factors >= 2:
+            bits |= 1 << bit['environmental_stress']
+        
+        return bits
     
-    def detect_anomalies(self, sensor_data, data_history=None):
-        """ตรวจจับความผิดปกติแบบขั้นสูง v2.1"""
+    def detect_anomalies(self, sensor_data=None, data_history=None):
+        """ตรวจจับความผิดปกติแบบขั้นสูง v2.1 (ไม่ส่ง sensor_data = ตรวจ reading ล่าสุดจาก push)
+        
+        'data' / 'previous_data' ในผลลัพธ์อ้างถึง dict ของ input ตัวเดียวกัน (ไม่ copy) -
+        ถ้าจะแก้ไข input ต่อหรือเก็บผลไว้นาน ให้ copy dict ทั้งสองเอง
+        """
         try:
-            anomalies = []
+            if sensor_data is None:
+                return self._detect_latest()
             
             if isinstance(sensor_data, dict):
                 current_data = sensor_data
@@ -1164,49 +1781,118 @@ class RuleBasedAnomalyDetector:
                 previous_data = data_stream[-2] if len(data_stream) > 1 else None
                 full_data_stream = data_stream
             
-            # ตรวจสอบตามกฎทั้งหมด
-            for rule_name, rule_config in self.rules.items():
-                try:
-                    is_anomaly = rule_config['condition'](current_data, previous_data, full_data_stream)
-                    
-                    if is_anomaly:
-                        anomaly_info = {
-                            'type': rule_name,
-                            'alert_level': rule_config['alert_level'],
-                            'message': rule_config['message'],
-                            'priority': rule_config['priority'],
-                            'timestamp': current_data.get('timestamp', datetime.now().isoformat()),
-                            'confidence': 0.95,
-                            'data': current_data.copy()
-                        }
-                        
-                        if previous_data:
-                            anomaly_info['previous_data'] = previous_data.copy()
-                        
-                        anomalies.append(anomaly_info)
-                        
-                except Exception as rule_error:
-                    logger.error(f"ข้อผิดพลาดใน rule {rule_name}: {rule_error}")
-                    continue
-            
-            # เรียงตาม priority
-            anomalies.sort(key=lambda x: x['priority'], reverse=True)
+            # กฎที่ไม่ขึ้นกับประวัติประเมินรวมกันครั้งเดียวเป็น bitmask
+            bits = self._evaluate_mask(self._reading_values(current_data), self._reading_values(previous_data))
             
-            return anomalies
+            return self._collect_anomalies(current_data, previous_data, full_data_stream, bits)
             
         except Exception as e:
             logger.error(f"ข้อผิดพลาดใน detect_anomalies: {e}")
             return []
     
+    def _detect_latest(self):
+        """ตรวจ reading ล่าสุดใน stream buffer - กรณี debounce คืนผลที่นับไว้แล้วตอน push"""
+        if self.debounce_window > 1:
+            return list(self._debounced_latest)
+        return self._evaluate_latest()
+    
+    def _evaluate_latest(self):
+        """ประเมินกฎของ reading ล่าสุดใน stream buffer - ใช้ค่าตัวเลขที่ดึงไว้แล้วตอน push"""
+        entries = list(self._stream)
+        if not entries:
+            return []
+        
+        data_stream = [reading for reading, _ in entries]
+        current_data, current_values = entries[-1]
+        previous_data, previous_values = entries[-2] if len(entries) > 1 else (None, None)
+        
+        bits = self._evaluate_mask(current_values, previous_values)
+        return self._collect_anomalies(current_data, previous_data, data_stream, bits)
+    
+    def _debounce(self, device_id, anomalies):
+        """นับจำนวน reading ติดต่อกันของแต่ละกฎต่ออุปกรณ์ (reset เมื่อไม่เกิด) แล้วคืนเฉพาะ anomaly ที่ครบ debounce_window"""
+        fired = {anomaly['type'] for anomaly in anomalies}
+        for rule_name in self.rules:
+            key = (device_id, rule_name)
+            if rule_name in fired:
+                self._consecutive[key] += 1
+            else:
+                self._consecutive.pop(key, None)
+        
+        return [anomaly for anomaly in anomalies
+                if self._consecutive[(device_id, anomaly['type'])] >= self.debounce_window]
+    
+    def _collect_anomalies(self, current_data, previous_data, full_data_stream, bits):
+        """รวมผลกฎทั้งหมด (bitmask + กฎที่ใช้ประวัติ) เป็นรายการ anomaly เรียงตาม priority"""
+        anomalies = []
+        timestamp = None
+        
+        # ตรวจสอบตามกฎทั้งหมด
+        for rule_name, rule_config in self.rules.items():
+            try:
+                if rule_name in self._mask_bits:
+                    is_anomaly = (bits >> self._mask_bits[rule_name]) & 1
+                else:
+                    is_anomaly = rule_config['condition'](current_data, previous_data, full_data_stream)
+                
+                if is_anomaly:
+                    # timestamp ของ record เดียวกันทุก anomaly - หาครั้งเดียว (datetime.now() เฉพาะเมื่อไม่มี key)
+                    if timestamp is None:
+                        timestamp = current_data['timestamp'] if 'timestamp' in current_data else datetime.now().isoformat()
+                    
+                    anomaly_info = {
+                        'type': rule_name,
+                        'alert_level': rule_config['alert_level'],
+                        'message': rule_config['message'],
+                        'priority': rule_config['priority'],
+                        'timestamp': timestamp,
+                        'confidence': 0.95,
+                        'data': current_data
+                    }
+                    
+                    if previous_data:
+                        anomaly_info['previous_data'] = previous_data
+                    
+                    anomalies.append(anomaly_info)
+                    
+            except Exception as rule_error:
+                logger.error(f"ข้อผิดพลาดใน rule {rule_name}: {rule_error}")
+                continue
+        
+        # เรียงตาม priority
+        anomalies.sort(key=itemgetter('priority'), reverse=True)
+        
+        return anomalies
+    
     def _safe_get_numeric_value(self, data, key, default=0):
         """ดึงค่าตัวเลขอย่างปลอดภัย"""
         try:
             value = data.get(key)
+        except Exception:
+            return default
+        
+        # fast path: float/int ธรรมดา (กรณีส่วนใหญ่) - type() is เร็วกว่า isinstance และไม่รวม bool/numpy scalar
+        value_type = type(value)
+        if value_type is float:
+            # เฉพาะค่า finite ที่ value - value == 0 (NaN และ ±inf ได้ NaN)
+            return value if value - value == 0 else default
+        if value_type is int:
+            try:
+                return float(value)
+            except OverflowError:
+                return default
+        
+        return self._coerce_numeric_value(value, default)
+    
+    def _coerce_numeric_value(self, value, default=0):
+        """slow path ของ _safe_get_numeric_value - None, str, bool, numpy scalar และชนิดอื่น"""
+        try:
             if value is None:
                 return default
             
             if isinstance(value, (int, float)):
-                if not np.isfinite(value):
+                # math.isfinite กับ Python scalar เร็วกว่า np.isfinite ราว 20 เท่า (ไม่ผ่าน ufunc dispatch)
+                if not math.isfinite(value):
                     return default
                 return float(value)
             elif isinstance(value, str):
@@ -1220,189 +1906,17 @@ class RuleBasedAnomalyDetector:
             return default
     
     # Rule checking methods - ปรับปรุงให้แม่นยำขึ้น
-    def _check_sudden_drop(self, current_data, previous_data, data_history):
-        try:
-            if previous_data is None:
-                return False
-            
-            current_temp = self._safe_get_numeric_value(current_data, 'temperature')
-            prev_temp = self._safe_get_numeric_value(previous_data, 'temperature')
-            current_voltage = self._safe_get_numeric_value(current_data, 'voltage')
-            prev_voltage = self._safe_get_numeric_value(previous_data, 'voltage')
-            
-            # ตรวจสอบการลดลงของอุณหภูมิ
-            if current_temp > 0 and prev_temp > 0:
-                temp_drop = prev_temp - current_temp
-                temp_drop_percent = temp_drop / prev_temp if prev_temp > 0 else 0
-                
-                if temp_drop > self.thresholds['temp_change_critical'] or temp_drop_percent > 0.25:
-                    return True
-            
-            # ตรวจสอบการลดลงของแรงดัน
-            if current_voltage > 0 and prev_voltage > 0:
-                voltage_drop = prev_voltage - current_voltage
-                voltage_drop_percent = voltage_drop / prev_voltage if prev_voltage > 0 else 0
-                
-                if voltage_drop > 0.5 or voltage_drop_percent > 0.2:
-                    return True
-            
-            # ตรวจสอบแรงดันต่ำมาก
-            if 0 < current_voltage < self.thresholds['voltage_critical']:
-                return True
-            
-            return False
-        except Exception:
-            return False
-    
-    def _check_sudden_spike(self, current_data, previous_data, data_history):
-        try:
-            if previous_data is None:
-                return False
-            
-            current_temp = self._safe_get_numeric_value(current_data, 'temperature')
-            prev_temp = self._safe_get_numeric_value(previous_data, 'temperature')
-            current_voltage = self._safe_get_numeric_value(current_data, 'voltage')
-            current_co2 = self._safe_get_numeric_value(current_data, 'co2')
-            
-            # ตรวจสอบการพุ่งสูงของอุณหภูมิ
-            if current_temp > 0 and prev_temp > 0:
-                temp_spike = current_temp - prev_temp
-                if temp_spike > self.thresholds['temp_change_critical']:
-                    return True
-            
-            # ตรวจสอบอุณหภูมิสูงเกินไป
-            if current_temp > 45:
-                return True
-            
-            # ตรวจสอบแรงดันสูงเกินไป
-            if current_voltage > 4.0:
-                return True
-            
-            # ตรวจสอบ CO2 สูงเกินไป
-            if current_co2 > self.thresholds['co2_critical_high']:
-                return True
-            
-            return False
-        except Exception:
-            return False
-    
-    def _check_vpd_too_low(self, current_data, previous_data, data_history):
-        try:
-            current_vpd = self._safe_get_numeric_value(current_data, 'vpd')
-            
-            # ตรวจสอบ VPD จากข้อมูลโดยตรง
-            if current_vpd > 0 and current_vpd < self.thresholds['vpd_critical']:
-                return True
-            
-            # คำนวณ VPD จากอุณหภูมิและความชื้น
-            temp = self._safe_get_numeric_value(current_data, 'temperature')
-            humidity = self._safe_get_numeric_value(current_data, 'humidity')
-            
-            if temp > 0 and 0 < humidity <= 100:
-                try:
-                    # คำนวณ VPD
-                    saturation_vapor_pressure = 0.6108 * np.exp((17.27 * temp) / (temp + 237.3))
-                    actual_vapor_pressure = saturation_vapor_pressure * (humidity / 100)
-                    calculated_vpd = saturation_vapor_pressure - actual_vapor_pressure
-                    
-                    if 0 < calculated_vpd < self.thresholds['vpd_critical']:
-                        return True
-                except Exception:
-                    return False
-            
-            return False
-        except Exception:
-            return False
-    
-    def _check_low_voltage(self, current_data, previous_data, data_history):
-        try:
-            current_voltage = self._safe_get_numeric_value(current_data, 'voltage')
-            battery_level = self._safe_get_numeric_value(current_data, 'battery_level')
-            
-            # ตรวจสอบแรงดันต่ำ
-            if 0 < current_voltage < self.thresholds['voltage_warning']:
-                return True
-            
-            # ตรวจสอบความสัมพันธ์ระหว่างแรงดันและแบตเตอรี่
-            if (0 < current_voltage < 3.0 and 0 < battery_level < 30):
-                return True
-            
-            return False
-        except Exception:
-            return False
-    
-    def _check_dew_point_close(self, current_data, previous_data, data_history):
-        try:
-            temp = self._safe_get_numeric_value(current_data, 'temperature')
-            dew_point = self._safe_get_numeric_value(current_data, 'dew_point')
-            humidity = self._safe_get_numeric_value(current_data, 'humidity')
-            
-            # ตรวจสอบจากข้อมูล dew point โดยตรง
-            if temp > 0 and dew_point > 0:
-                temp_diff = temp - dew_point
-                if temp_diff < self.thresholds['dew_point_critical']:
-                    return True
-            
-            # คำนวณ dew point จากอุณหภูมิและความชื้น
-            if temp > 0 and 0 < humidity <= 100:
-                try:
-                    a, b = 17.27, 237.7
-                    alpha = ((a * temp) / (b + temp)) + np.log(humidity / 100)
-                    calculated_dew_point = (b * alpha) / (a - alpha)
-                    
-                    temp_diff = temp - calculated_dew_point
-                    if temp_diff < self.thresholds['dew_point_critical']:
-                        return True
-                except Exception:
-                    return False
-            
-            # ตรวจสอบความชื้นสูงมาก + อุณหภูมิต่ำ (เสี่ยงเกิดน้ำค้าง)
-            if humidity > 95 and temp < 25:
-                return True
-            
-            return False
-        except Exception:
-            return False
-    
-    def _check_battery_depleted(self, current_data, previous_data, data_history):
-        try:
-            battery_level = self._safe_get_numeric_value(current_data, 'battery_level')
-            voltage = self._safe_get_numeric_value(current_data, 'voltage')
-            
-            # ตรวจสอบแบตเตอรี่หมด
-            if battery_level > 0 and battery_level < self.thresholds['battery_critical']:
-                return True
-            
-            # ตรวจสอบแรงดันต่ำมาก (บ่งชี้แบตเตอรี่หมด)
-            if 0 < voltage < 2.3:
-                return True
-            
-            # ตรวจสอบการลดลงของแบตเตอรี่อย่างรวดเร็ว
-            if previous_data:
-                prev_battery = self._safe_get_numeric_value(previous_data, 'battery_level')
-                if prev_battery > 0 and battery_level > 0:
-                    battery_drop = prev_battery - battery_level
-                    if battery_drop > 20:  # ลดลงมากกว่า 20% ในครั้งเดียว
-                        return True
-            
-            return False
-        except Exception:
-            return False
-    
     def _check_sensor_failure(self, current_data, previous_data, data_history):
         try:
-            failure_values = [0, -999, 999, -1, 9999, None]
-            
             # ตรวจสอบค่า error codes
-            critical_sensors = ['temperature', 'humidity', 'voltage']
             failed_sensors = 0
             
-            for sensor in critical_sensors:
+            for sensor in CRITICAL_SENSORS:
                 value = current_data.get(sensor)
-                if value in failure_values:
+                if value in SENSOR_FAILURE_VALUES:
                     failed_sensors += 1
-                elif isinstance(value, (int, float)):
-                    # ตรวจสอบค่าที่ผิดปกติ
+                elif isinstance(value, numbers.Real):
+                    # ตรวจสอบค่าที่ผิดปกติ (รวม numpy scalar)
                     if sensor == 'temperature' and (value < -50 or value > 80):
                         failed_sensors += 1
                     elif sensor == 'humidity' and (value < 0 or value > 100):
@@ -1417,92 +1931,30 @@ class RuleBasedAnomalyDetector:
             # ตรวจสอบค่าที่ไม่เปลี่ยนแปลง (stuck values)
             if len(data_history) >= 5:
                 recent_data = data_history[-5:]
-                for sensor in critical_sensors:
-                    values = [self._safe_get_numeric_value(d, sensor) for d in recent_data]
-                    unique_values = len(set(values))
-                    if unique_values == 1 and values[0] not in [0, None]:
-                        # ค่าเดิมๆ 5 ครั้งติดต่อกัน (ไม่รวม 0 หรือ None)
+                for sensor in CRITICAL_SENSORS:
+                    # ค่าเดิมๆ 5 ครั้งติดต่อกัน (ไม่รวม 0 หรือ None) - เทียบกับค่าแรกแล้วหยุดทันทีที่เจอค่าต่าง
+                    first_value = self._safe_get_numeric_value(recent_data[0], sensor)
+                    if first_value == 0:
+                        continue
+                    for d in recent_data[1:]:
+                        if self._safe_get_numeric_value(d, sensor) != first_value:
+                            break
+                    else:
                         return True
             
             return False
         except Exception:
             return False
     
-    def _check_high_fluctuation(self, current_data, previous_data, data_history):
-        try:
-            if previous_data is None:
-                return False
-            
-            fluctuation_sensors = ['temperature', 'humidity', 'voltage', 'co2']
-            high_fluctuation_count = 0
-            
-            for sensor in fluctuation_sensors:
-                current_val = self._safe_get_numeric_value(current_data, sensor)
-                prev_val = self._safe_get_numeric_value(previous_data, sensor)
-                
-                if current_val > 0 and prev_val > 0:
-                    change_percent = abs(current_val - prev_val) / prev_val if prev_val > 0 else 0
-                    
-                    # กำหนดเกณฑ์การเปลี่ยนแปลงตามประเภทเซนเซอร์
-                    if sensor == 'temperature' and change_percent > 0.15:  # 15%
-                        high_fluctuation_count += 1
-                    elif sensor == 'humidity' and change_percent > 0.20:  # 20%
-                        high_fluctuation_count += 1
-                    elif sensor == 'voltage' and change_percent > 0.25:  # 25%
-                        high_fluctuation_count += 1
-                    elif sensor == 'co2' and change_percent > 0.30:  # 30%
-                        high_fluctuation_count += 1
-            
-            # ถ้ามีเซนเซอร์ที่ผันผวนสูงมากกว่า 2 ตัว
-            return high_fluctuation_count >= 2
-            
-        except Exception:
-            return False
-    
-    def _check_environmental_stress(self, current_data, previous_data, data_history):
-        try:
-            temp = self._safe_get_numeric_value(current_data, 'temperature')
-            humidity = self._safe_get_numeric_value(current_data, 'humidity')
-            vpd = self._safe_get_numeric_value(current_data, 'vpd')
-            co2 = self._safe_get_numeric_value(current_data, 'co2')
-            
-            stress_factors = 0
-            
-            # ความชื้นสูงเกินไป + อุณหภูมิต่ำ (เสี่ยงเชื้อรา)
-            if humidity > self.thresholds['humidity_extreme_high'] and temp < 18:
-                stress_factors += 1
-            
-            # ความชื้นต่ำเกินไป + อุณหภูมิสูง (ความเครียดจากแห้ง)
-            if humidity < self.thresholds['humidity_extreme_low'] and temp > 38:
-                stress_factors += 1
-            
-            # VPD ในช่วงเสี่ยง
-            if 0 < vpd < self.thresholds['vpd_warning']:
-                stress_factors += 1
-            
-            # CO2 สูงเกินไป
-            if co2 > self.thresholds['co2_warning_high']:
-                stress_factors += 1
-            
-            # สภาพอากาศรุนแรง
-            if temp > 42 or temp < 8:
-                stress_factors += 1
-            
-            # ถ้ามี stress factors มากกว่าหรือเท่ากับ 2
-            return stress_factors >= 2
-            
-        except Exception:
-            return False
-    
     def _check_gradual_drift(self, current_data, previous_data, data_history):
         try:
             if len(data_history) < 8:  # ต้องมีข้อมูลอย่างน้อย 8 จุด
                 return False
             
             recent_data = data_history[-8:]  # ดูข้อมูล 8 จุดล่าสุด
-            sensors_to_check = ['temperature', 'ec', 'ph']
             
-            for sensor in sensors_to_check:
+            # เกณฑ์ drift ตามประเภทเซนเซอร์ (DRIFT_LIMITS)
+            for sensor, drift_limit in DRIFT_LIMITS:
                 values = [self._safe_get_numeric_value(d, sensor) for d in recent_data]
                 values = [v for v in values if v > -100]  # กรองค่า error ออก
                 
@@ -1510,18 +1962,15 @@ class RuleBasedAnomalyDetector:
                     continue
                 
                 try:
-                    # คำนวณ trend โดยใช้ linear regression
-                    x = np.arange(len(values))
-                    slope = np.polyfit(x, values, 1)[0]
-                    
-                    # กำหนดเกณฑ์ drift ตามประเภทเซนเซอร์
-                    drift_threshold = {
-                        'temperature': 0.8,  # 0.8°C ต่อ reading
-                        'ec': 0.15,          # 0.15 EC ต่อ reading
-                        'ph': 0.2            # 0.2 pH ต่อ reading
-                    }
+                    # คำนวณ trend โดยใช้ linear regression (slope แบบ closed form บน x = 0..n-1
+                    # ให้ผลเดียวกับ np.polyfit(x, values, 1)[0] แต่ไม่ต้องสร้าง matrix และเรียก lstsq)
+                    n = len(values)
+                    x_mean = (n - 1) / 2
+                    y_mean = sum(values) / n
+                    covariance = sum((i - x_mean) * (value - y_mean) for i, value in enumerate(values))
+                    slope = covariance / (n * (n * n - 1) / 12)
                     
-                    if abs(slope) > drift_threshold.get(sensor, 0.5):
+                    if abs(slope) > drift_limit:
                         return True
                         
                 except Exception:
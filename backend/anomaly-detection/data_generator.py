@@ -1,13 +1,14 @@
 import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
-import random
+import math
 import os
 import warnings
+from collections import OrderedDict
 warnings.filterwarnings('ignore')
 
 class SensorDataGenerator:
-    def __init__(self):
+    def __init__(self, seed=None):
         # ช่วงค่าที่ปรับปรุงให้แม่นยำและสมจริงขึ้น
         self.normal_ranges = {
             'temperature': {'min': 15, 'max': 40, 'optimal': 25, 'std': 2.5},
@@ -28,8 +29,12 @@ class SensorDataGenerator:
             'normal': {'temp_offset': 0, 'humidity_offset': 0, 'co2_offset': 0}
         }
         
-        # แคช derived values เพื่อป้องกัน recalculation
-        self._derived_cache = {}
+        # แคช derived values เพื่อป้องกัน recalculation (LRU - ลบรายการที่ใช้ล่าสุดนานที่สุดทีละรายการ)
+        self._derived_cache = OrderedDict()
+        self._derived_cache_size = 1000
+        
+        # RNG ของ instance (PCG64) - ทุกการสุ่มของ generator ใช้ตัวนี้ (seed เดียวกันได้ข้อมูลเดิม), batch สุ่มทั้งคอลัมน์ในครั้งเดียว
+        self.rng = np.random.default_rng(seed)
         
     def _safe_numeric_operation(self, operation, *args, fallback=0.0):
         """ทำการคำนวณอย่างปลอดภัยป้องกัน overflow/underflow"""
@@ -45,16 +50,20 @@ class SensorDataGenerator:
         """คำนวณค่าที่ได้มาจากอุณหภูมิและความชื้น - ปรับปรุงความเสถียร"""
         # สร้าง cache key
         cache_key = f"{temperature:.2f}_{humidity:.2f}"
-        if cache_key in self._derived_cache:
-            return self._derived_cache[cache_key]
+        cached = self._derived_cache.get(cache_key)
+        if cached is not None:
+            self._derived_cache.move_to_end(cache_key)
+            return cached
         
         try:
             # ตรวจสอบและจำกัดค่า input
             if not all(isinstance(x, (int, float)) for x in [temperature, humidity]):
                 return 0.0, 1.0
                 
-            safe_temp = np.clip(float(temperature), -30, 70)
-            safe_humidity = np.clip(float(humidity), 1, 99.9)
+            # scalar ใช้ math และ min/max แทน np.log/np.exp/np.clip (ไม่ผ่าน ufunc dispatch ทุกครั้ง)
+            # min(max(x, low), high) ให้ NaN ผ่านไปเหมือน np.clip เพราะ x อยู่ตำแหน่งแรก
+            safe_temp = min(max(float(temperature), -30), 70)
+            safe_humidity = min(max(float(humidity), 1), 99.9)
             
             # Dew Point - ใช้สูตร Magnus ที่ปรับปรุง
             def calc_dew_point(temp, hum):
@@ -62,9 +71,9 @@ class SensorDataGenerator:
                     return temp - 10
                 
                 a, b = 17.625, 243.04  # ค่าคงที่ที่แม่นยำขึ้น
-                alpha = np.log(hum / 100) + (a * temp) / (b + temp)
+                alpha = math.log(hum / 100) + (a * temp) / (b + temp)
                 dew_point = (b * alpha) / (a - alpha)
-                return np.clip(dew_point, temp - 30, temp - 0.1)
+                return min(max(dew_point, temp - 30), temp - 0.1)
             
             dew_point = self._safe_numeric_operation(
                 calc_dew_point, safe_temp, safe_humidity, 
@@ -77,10 +86,10 @@ class SensorDataGenerator:
                     return 1.0
                 
                 # คำนวณ saturation vapor pressure (kPa)
-                svp = 0.6108 * np.exp((17.27 * temp) / (temp + 237.3))
+                svp = 0.6108 * math.exp((17.27 * temp) / (temp + 237.3))
                 avp = svp * (hum / 100)
                 vpd_val = svp - avp
-                return np.clip(vpd_val, 0.01, 8.0)
+                return min(max(vpd_val, 0.01), 8.0)
             
             vpd = self._safe_numeric_operation(
                 calc_vpd, safe_temp, safe_humidity,
@@ -91,12 +100,9 @@ class SensorDataGenerator:
             result = (round(float(dew_point), 2), round(float(vpd), 3))
             self._derived_cache[cache_key] = result
             
-            # จำกัดขนาด cache
-            if len(self._derived_cache) > 1000:
-                # ลบ cache เก่า 20%
-                items_to_remove = list(self._derived_cache.keys())[:200]
-                for key in items_to_remove:
-                    del self._derived_cache[key]
+            # จำกัดขนาด cache - O(1) ต่อครั้ง ไม่ต้องสร้าง list ของ key ทั้งหมด
+            if len(self._derived_cache) > self._derived_cache_size:
+                self._derived_cache.popitem(last=False)
             
             return result
             
@@ -111,7 +117,7 @@ class SensorDataGenerator:
                 return bounds[0] if bounds else 0
             
             # ใช้ Gaussian noise แต่จำกัดที่ 3 sigma
-            noise = np.random.normal(0, std_dev)
+            noise = self.rng.normal(0, std_dev)
             noise = np.clip(noise, -3 * std_dev, 3 * std_dev)
             
             new_value = base_value + noise
@@ -124,6 +130,22 @@ class SensorDataGenerator:
         except Exception:
             return bounds[0] if bounds else 0
     
+    def add_realistic_noise_batch(self, base_values, std_dev, bounds=None, size=None):
+        """add_realistic_noise แบบ vectorized - สุ่ม noise ทั้ง array ในครั้งเดียวจาก self.rng
+        
+        base_values: array หรือค่าเดียว (size = จำนวนค่าที่ต้องการเมื่อ base เป็นค่าเดียว)
+        """
+        if size is None:
+            size = np.shape(base_values)
+        
+        # Gaussian noise จำกัดที่ 3 sigma แล้ว clip ตามขอบเขต (clip ใน array เดิม ไม่สร้าง temporary เพิ่ม)
+        noise = self.rng.normal(0, std_dev, size)
+        np.clip(noise, -3 * std_dev, 3 * std_dev, out=noise)
+        values = np.add(base_values, noise, out=noise)
+        if bounds:
+            np.clip(values, bounds[0], bounds[1], out=values)
+        return values
+    
     def add_time_patterns(self, base_temp, base_humidity, current_time, season='normal'):
         """เพิ่มรูปแบบตามเวลาที่ซับซ้อนและสมจริง"""
         try:
@@ -150,7 +172,7 @@ class SensorDataGenerator:
             total_humidity_change = (daily_humidity_cycle + seasonal_humidity_cycle * 0.3) * weekly_factor
             
             # เพิ่มความผันผวนแบบสุ่ม
-            weather_noise = np.random.normal(0, 1.8)
+            weather_noise = self.rng.normal(0, 1.8)
             total_temp_change += weather_noise
             total_humidity_change += weather_noise * 0.7
             
@@ -169,6 +191,39 @@ class SensorDataGenerator:
         except Exception:
             return 0.0, 0.0
     
+    def add_time_patterns_batch(self, timestamps, season_index):
+        """add_time_patterns แบบ vectorized - คืน (temp_change, humidity_change) เป็น array หนึ่งค่าต่อจุดเวลา
+        
+        timestamps: pd.DatetimeIndex, season_index: ลำดับฤดูใน self.seasonal_patterns ต่อแถว
+        """
+        season_names = list(self.seasonal_patterns)
+        temp_offsets = np.array([self.seasonal_patterns[s]['temp_offset'] for s in season_names], dtype=np.float64)
+        humidity_offsets = np.array([self.seasonal_patterns[s]['humidity_offset'] for s in season_names], dtype=np.float64)
+        
+        hour = timestamps.hour.to_numpy()
+        day_of_year = timestamps.dayofyear.to_numpy()
+        day_of_week = timestamps.dayofweek.to_numpy()
+        
+        # รูปแบบรายวัน / รายปี / รายสัปดาห์ - sin ทั้ง array ครั้งเดียว
+        daytime = (hour >= 10) & (hour <= 16)
+        daily_sin = np.sin((hour - 6) * np.pi / 12)
+        seasonal_sin = np.sin((day_of_year - 80) * 2 * np.pi / 365)
+        weekly_factor = np.where(day_of_week >= 5, 0.8, 1.0)
+        
+        temp_change = (5 * daily_sin * np.where(daytime, 1.2, 0.8) + 10 * seasonal_sin * 0.3) * weekly_factor
+        humidity_change = (-4 * daily_sin * np.where(daytime, 0.8, 1.2) + -6 * seasonal_sin * 0.3) * weekly_factor
+        
+        # ความผันผวนแบบสุ่ม + offset ตามฤดูกาล แล้วจำกัดการเปลี่ยนแปลง
+        weather_noise = self.rng.normal(0, 1.8, len(timestamps))
+        temp_change += weather_noise
+        temp_change += temp_offsets.take(season_index)
+        humidity_change += weather_noise * 0.7
+        humidity_change += humidity_offsets.take(season_index)
+        np.clip(temp_change, -18, 18, out=temp_change)
+        np.clip(humidity_change, -25, 25, out=humidity_change)
+        
+        return temp_change, humidity_change
+    
     def generate_normal_data_enhanced(self, timestamp=None, season='normal'):
         """สร้างข้อมูลปกติที่มีคุณภาพสูงและมีเสถียรภาพ"""
         if timestamp is None:
@@ -234,7 +289,7 @@ class SensorDataGenerator:
             }
             
             # Battery level - ลดลงตามเวลาอย่างสมจริง
-            battery_decline = timestamp.hour * 0.3 + np.random.normal(0, 2)
+            battery_decline = timestamp.hour * 0.3 + self.rng.normal(0, 2)
             battery_base = max(20, self.normal_ranges['battery_level']['optimal'] - battery_decline)
             data['battery_level'] = round(self.add_realistic_noise(
                 battery_base,
@@ -266,10 +321,95 @@ class SensorDataGenerator:
                 'timestamp': timestamp.isoformat()
             }
     
+    def calculate_derived_values_batch(self, temperature, humidity):
+        """calculate_derived_values แบบ vectorized - รับ array ของอุณหภูมิ/ความชื้น คืน (dew_point, vpd) เป็น array"""
+        safe_temp = np.clip(np.asarray(temperature, dtype=np.float64), -30, 70)
+        safe_humidity = np.clip(np.asarray(humidity, dtype=np.float64), 1, 99.9)
+        
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            # Dew Point - สูตร Magnus ค่าคงที่เดียวกับ calculate_derived_values
+            a, b = 17.625, 243.04
+            alpha = np.log(safe_humidity / 100) + (a * safe_temp) / (b + safe_temp)
+            dew_point = np.clip((b * alpha) / (a - alpha), safe_temp - 30, safe_temp - 0.1)
+            dew_point = np.where(np.isfinite(dew_point), dew_point, safe_temp - 8)
+            
+            # VPD
+            svp = 0.6108 * np.exp((17.27 * safe_temp) / (safe_temp + 237.3))
+            vpd = np.clip(svp - svp * (safe_humidity / 100), 0.01, 8.0)
+            vpd = np.where(np.isfinite(vpd) & (safe_temp > -20) & (safe_humidity < 100), vpd, 1.0)
+        
+        return np.round(dew_point, 2), np.round(vpd, 3)
+    
+    def generate_normal_data_batch(self, timestamps, seasons=None):
+        """สร้างข้อมูลปกติหลายจุดเวลาในครั้งเดียว (vectorized) - การแจกแจงเดียวกับ generate_normal_data_enhanced
+        
+        timestamps: pd.DatetimeIndex ของจุดเวลา, seasons: array ชื่อฤดูต่อแถว (None = 'normal')
+        คืนค่า DataFrame คอลัมน์เดียวกับ dict ของ generate_normal_data_enhanced
+        """
+        timestamps = pd.DatetimeIndex(timestamps)
+        n = len(timestamps)
+        ranges = self.normal_ranges
+        
+        def noisy(base, spec, low, high):
+            return self.add_realistic_noise_batch(base, spec['std'], (low, high), size=n)
+        
+        # ค่า offset ตามฤดูกาลต่อแถว
+        if seasons is None:
+            seasons = np.full(n, 'normal')
+        season_names = list(self.seasonal_patterns)
+        season_index = pd.Index(season_names).get_indexer(seasons)
+        season_index[season_index < 0] = season_names.index('normal')
+        co2_offsets = np.array([self.seasonal_patterns[s]['co2_offset'] for s in season_names], dtype=np.float64)
+        
+        # รูปแบบตามเวลา
+        hour = timestamps.hour.to_numpy()
+        temp_change, humidity_change = self.add_time_patterns_batch(timestamps, season_index)
+        
+        # เซนเซอร์หลัก
+        temperature = noisy(ranges['temperature']['optimal'] + temp_change, ranges['temperature'],
+                            ranges['temperature']['min'], ranges['temperature']['max'])
+        humidity = noisy(ranges['humidity']['optimal'] + humidity_change, ranges['humidity'],
+                         ranges['humidity']['min'], ranges['humidity']['max'])
+        
+        # CO2 เพิ่มเมื่อร้อน ลดในเวลากลางวัน (photosynthesis)
+        co2_base = (ranges['co2']['optimal'] + np.where(temperature > 32, 250, 0)
+                    - np.where((hour >= 6) & (hour <= 18), 100, 0) + co2_offsets[season_index])
+        
+        # Battery level - ลดลงตามเวลา
+        battery_decline = hour * 0.3 + self.rng.normal(0, 2, n)
+        battery_base = np.maximum(20, ranges['battery_level']['optimal'] - battery_decline)
+        
+        temperature = np.round(temperature, 2)
+        humidity = np.round(humidity, 2)
+        dew_point, vpd = self.calculate_derived_values_batch(temperature, humidity)
+        
+        df = pd.DataFrame({
+            'temperature': temperature,
+            'humidity': humidity,
+            'co2': np.round(noisy(co2_base, ranges['co2'], ranges['co2']['min'], ranges['co2']['max'])).astype(np.int64),
+            'ec': np.round(noisy(ranges['ec']['optimal'], ranges['ec'], ranges['ec']['min'], ranges['ec']['max']), 2),
+            'ph': np.round(noisy(ranges['ph']['optimal'], ranges['ph'], ranges['ph']['min'], ranges['ph']['max']), 2),
+            'voltage': np.round(noisy(ranges['voltage']['optimal'], ranges['voltage'],
+                                      ranges['voltage']['min'], ranges['voltage']['max']), 2),
+            'battery_level': np.round(noisy(battery_base, ranges['battery_level'],
+                                            ranges['battery_level']['min'], 100)).astype(np.int64),
+            'dew_point': dew_point,
+            'vpd': vpd,
+            'timestamp': timestamps.strftime(
+                '%Y-%m-%dT%H:%M:%S.%f' if (timestamps.microsecond != 0).any() else '%Y-%m-%dT%H:%M:%S'
+            )
+        })
+        
+        return df
+    
     def generate_edge_case_normal_data(self, count=1000):
         """สร้างข้อมูลปกติที่อยู่ใกล้ขอบเขต - ปรับปรุงแล้ว"""
-        edge_data = []
-        
+        if count <= 0:
+            return []
+        return self._generate_edge_case_frame(count).to_dict('records')
+    
+    def _generate_edge_case_frame(self, count):
+        """สร้างข้อมูลขอบเขตทั้งชุดเป็น DataFrame (vectorized) - ใช้ร่วมกับ generate_comprehensive_dataset_enhanced"""
         # สร้าง edge case patterns ที่หลากหลายขึ้น
         edge_patterns = [
             # VPD ขอบเขตต่ำ
@@ -286,47 +426,46 @@ class SensorDataGenerator:
             {'ph_range': (5.1, 5.5), 'ec_range': (2.2, 2.7), 'type': 'acidic'},
         ]
         
-        for i in range(count):
-            try:
-                pattern = random.choice(edge_patterns)
-                timestamp = datetime.now() - timedelta(minutes=random.randint(0, 43200))
-                
-                # สร้างข้อมูลพื้นฐาน
-                data = self.generate_normal_data_enhanced(timestamp)
-                
-                # ปรับค่าตาม pattern
-                if 'temp_range' in pattern:
-                    data['temperature'] = round(random.uniform(*pattern['temp_range']), 2)
-                if 'humidity_range' in pattern:
-                    data['humidity'] = round(random.uniform(*pattern['humidity_range']), 2)
-                if 'voltage_range' in pattern:
-                    data['voltage'] = round(random.uniform(*pattern['voltage_range']), 2)
-                if 'battery_range' in pattern:
-                    data['battery_level'] = round(random.uniform(*pattern['battery_range']))
-                if 'co2_range' in pattern:
-                    data['co2'] = round(random.uniform(*pattern['co2_range']))
-                if 'ph_range' in pattern:
-                    data['ph'] = round(random.uniform(*pattern['ph_range']), 2)
-                if 'ec_range' in pattern:
-                    data['ec'] = round(random.uniform(*pattern['ec_range']), 2)
-                
-                # คำนวณค่าที่ได้มาใหม่
-                dew_point, vpd = self.calculate_derived_values(data['temperature'], data['humidity'])
-                data['dew_point'] = dew_point
-                data['vpd'] = vpd
-                data['anomaly_type'] = 'normal'
-                data['is_anomaly'] = 0
-                
-                edge_data.append(data)
-                
-            except Exception as e:
-                print(f"Error in edge case generation {i}: {e}")
+        # สุ่ม pattern และเวลา (ย้อนหลังไม่เกิน 30 วัน) ทั้งชุดครั้งเดียว แล้วสร้างข้อมูลพื้นฐานแบบ vectorized
+        pattern_index = self.rng.integers(0, len(edge_patterns), size=count)
+        minutes_ago = self.rng.integers(0, 43201, size=count)
+        timestamps = pd.Timestamp(datetime.now()) - pd.to_timedelta(minutes_ago, unit='min')
+        df = self.generate_normal_data_batch(timestamps)
+        
+        # ปรับค่าตาม pattern (คอลัมน์, ช่วงค่า, ทศนิยม - None = ปัดเป็นจำนวนเต็ม)
+        range_columns = [
+            ('temp_range', 'temperature', 2), ('humidity_range', 'humidity', 2),
+            ('voltage_range', 'voltage', 2), ('battery_range', 'battery_level', None),
+            ('co2_range', 'co2', None), ('ph_range', 'ph', 2), ('ec_range', 'ec', 2)
+        ]
+        for k, pattern in enumerate(edge_patterns):
+            rows = np.flatnonzero(pattern_index == k)
+            if len(rows) == 0:
                 continue
+            for range_key, column, decimals in range_columns:
+                if range_key in pattern:
+                    values = self.rng.uniform(*pattern[range_key], size=len(rows))
+                    values = np.round(values).astype(np.int64) if decimals is None else np.round(values, decimals)
+                    df.iloc[rows, df.columns.get_loc(column)] = values
+        
+        # คำนวณค่าที่ได้มาใหม่
+        df['dew_point'], df['vpd'] = self.calculate_derived_values_batch(df['temperature'], df['humidity'])
+        df['anomaly_type'] = 'normal'
+        df['is_anomaly'] = 0
         
-        return edge_data
+        return df
     
     def generate_sophisticated_anomalies(self, count=200, anomaly_types=None):
         """สร้างข้อมูลผิดปกติที่ซับซ้อนและสมจริง - ปรับปรุงแล้ว"""
+        if count <= 0:
+            return []
+        return self._generate_anomaly_frame(count, anomaly_types).to_dict('records')
+    
+    def _generate_anomaly_frame(self, count, anomaly_types=None):
+        """สร้างข้อมูลผิดปกติทั้งชุดเป็น DataFrame (vectorized) - ใช้ร่วมกับ generate_comprehensive_dataset_enhanced
+        
+        เริ่มจากข้อมูลปกติแบบ batch แล้วปรับค่าตามประเภท anomaly ทีละประเภทด้วย row mask
+        """
         if anomaly_types is None:
             anomaly_types = [
                 'sudden_drop', 'sudden_spike', 'vpd_too_low', 'low_voltage',
@@ -334,128 +473,116 @@ class SensorDataGenerator:
                 'high_fluctuation', 'gradual_drift', 'multi_sensor_failure',
                 'environmental_stress', 'power_surge', 'calibration_drift'
             ]
+        rng = self.rng
         
-        anomaly_data = []
+        # สุ่มประเภทและเวลา (ย้อนหลังไม่เกิน 30 วัน) แล้วเริ่มจากข้อมูลปกติ
+        types = np.asarray(anomaly_types)[rng.integers(0, len(anomaly_types), size=count)]
+        minutes_ago = rng.integers(0, 43201, size=count)
+        timestamps = pd.Timestamp(datetime.now()) - pd.to_timedelta(minutes_ago, unit='min')
+        df = self.generate_normal_data_batch(timestamps)
         
-        for i in range(count):
-            try:
-                anomaly_type = random.choice(anomaly_types)
-                timestamp = datetime.now() - timedelta(minutes=random.randint(0, 43200))
-                
-                # เริ่มจากข้อมูลปกติ
-                data = self.generate_normal_data_enhanced(timestamp)
-                
-                # ปรับค่าตามประเภท anomaly
-                if anomaly_type == 'sudden_drop':
-                    drop_factor = random.uniform(0.3, 0.8)
-                    data['temperature'] = max(data['temperature'] * drop_factor, -5)
-                    data['voltage'] = max(data['voltage'] * 0.6, 1.8)
-                    
-                elif anomaly_type == 'sudden_spike':
-                    spike_factor = random.uniform(1.4, 2.2)
-                    data['temperature'] = min(data['temperature'] * spike_factor, 65)
-                    data['voltage'] = min(data['voltage'] * 1.3, 4.8)
-                    
-                elif anomaly_type == 'vpd_too_low':
-                    data['humidity'] = random.uniform(92, 99)
-                    data['temperature'] = random.uniform(15, 25)
-                    
-                elif anomaly_type == 'low_voltage':
-                    data['voltage'] = random.uniform(1.5, 2.6)
-                    data['battery_level'] = random.uniform(0, 20)
-                    
-                elif anomaly_type == 'dew_point_close':
-                    data['humidity'] = random.uniform(95, 99)
-                    temp = random.uniform(18, 28)
-                    data['temperature'] = temp
-                    
-                elif anomaly_type == 'battery_depleted':
-                    data['battery_level'] = random.uniform(0, 8)
-                    data['voltage'] = random.uniform(1.2, 2.3)
-                    
-                elif anomaly_type == 'sensor_failure':
-                    # เลือก sensor ที่จะเสียแบบสุ่ม
-                    failing_sensors = random.sample(
-                        ['temperature', 'humidity', 'co2', 'voltage'], 
-                        random.randint(1, 3)
-                    )
-                    failure_values = [-999, 0, 9999, -1]
-                    for sensor in failing_sensors:
-                        data[sensor] = random.choice(failure_values)
-                        
-                elif anomaly_type == 'high_fluctuation':
-                    # ความผันผวนสูงในหลายเซนเซอร์
-                    fluctuation = random.uniform(10, 25)
-                    data['temperature'] += random.choice([-fluctuation, fluctuation])
-                    data['humidity'] += random.uniform(-20, 20)
-                    data['voltage'] += random.uniform(-0.8, 0.8)
-                    
-                elif anomaly_type == 'gradual_drift':
-                    # Drift ที่ค่อยเป็นค่อยไป
-                    drift_amount = random.uniform(8, 20)
-                    data['temperature'] = min(data['temperature'] + drift_amount, 60)
-                    data['ec'] += random.uniform(0.8, 2.0)
-                    data['ph'] += random.uniform(1.5, 3.0)
-                    
-                elif anomaly_type == 'multi_sensor_failure':
-                    # หลายเซนเซอร์เสียพร้อมกัน
-                    data.update({
-                        'temperature': -999,
-                        'humidity': 0,
-                        'voltage': 0,
-                        'battery_level': 0,
-                        'co2': -999
-                    })
-                    
-                elif anomaly_type == 'environmental_stress':
-                    # สถานการณ์สิ่งแวดล้อมรุนแรง
-                    stress_scenarios = [
-                        {'temperature': random.uniform(42, 50), 'humidity': random.uniform(15, 25)},
-                        {'temperature': random.uniform(8, 15), 'humidity': random.uniform(95, 99)},
-                        {'co2': random.uniform(2000, 2500), 'temperature': random.uniform(35, 42)}
-                    ]
-                    scenario = random.choice(stress_scenarios)
-                    data.update(scenario)
-                    
-                elif anomaly_type == 'power_surge':
-                    # กระแสไฟกระชาก
-                    data['voltage'] = random.uniform(4.2, 5.0)
-                    data['battery_level'] = random.uniform(95, 100)
-                    
-                elif anomaly_type == 'calibration_drift':
-                    # การเบี่ยงเบนของการสอบเทียบ
-                    drift_sensors = ['ec', 'ph', 'co2']
-                    for sensor in drift_sensors:
-                        if sensor in data:
-                            offset = random.uniform(0.5, 2.0) * random.choice([-1, 1])
-                            data[sensor] += offset
-                
-                # คำนวณค่าที่ได้มาใหม่ (ถ้าข้อมูลยังใช้ได้)
-                if (data['temperature'] > -100 and 0 < data['humidity'] <= 100):
-                    dew_point, vpd = self.calculate_derived_values(
-                        data['temperature'], data['humidity']
-                    )
-                    data['dew_point'] = dew_point
-                    data['vpd'] = vpd
-                else:
-                    data['dew_point'] = 0
-                    data['vpd'] = 0
-                
-                # ตรวจสอบค่าสุดท้าย
-                for key, value in data.items():
-                    if key not in ['timestamp', 'anomaly_type', 'is_anomaly']:
-                        if isinstance(value, (int, float)) and not np.isfinite(value):
-                            data[key] = 0
-                
-                data['anomaly_type'] = anomaly_type
-                data['is_anomaly'] = 1
-                anomaly_data.append(data)
-                
-            except Exception as e:
-                print(f"Error in anomaly generation {i}: {e}")
-                continue
+        sensor_columns = ['temperature', 'humidity', 'co2', 'ec', 'ph', 'voltage', 'battery_level']
+        temperature, humidity, co2, ec, ph, voltage, battery = (
+            df[col].to_numpy(dtype=np.float64, copy=True) for col in sensor_columns
+        )
+        
+        def rows_of(anomaly_type):
+            rows = np.flatnonzero(types == anomaly_type)
+            return rows, len(rows)
+        
+        def random_sign(size):
+            return rng.choice([-1.0, 1.0], size=size)
+        
+        # ปรับค่าตามประเภท anomaly
+        rows, m = rows_of('sudden_drop')
+        temperature[rows] = np.maximum(temperature[rows] * rng.uniform(0.3, 0.8, m), -5)
+        voltage[rows] = np.maximum(voltage[rows] * 0.6, 1.8)
+        
+        rows, m = rows_of('sudden_spike')
+        temperature[rows] = np.minimum(temperature[rows] * rng.uniform(1.4, 2.2, m), 65)
+        voltage[rows] = np.minimum(voltage[rows] * 1.3, 4.8)
+        
+        rows, m = rows_of('vpd_too_low')
+        humidity[rows] = rng.uniform(92, 99, m)
+        temperature[rows] = rng.uniform(15, 25, m)
+        
+        rows, m = rows_of('low_voltage')
+        voltage[rows] = rng.uniform(1.5, 2.6, m)
+        battery[rows] = rng.uniform(0, 20, m)
+        
+        rows, m = rows_of('dew_point_close')
+        humidity[rows] = rng.uniform(95, 99, m)
+        temperature[rows] = rng.uniform(18, 28, m)
+        
+        rows, m = rows_of('battery_depleted')
+        battery[rows] = rng.uniform(0, 8, m)
+        voltage[rows] = rng.uniform(1.2, 2.3, m)
+        
+        # เซนเซอร์เสีย 1-3 ตัวแบบสุ่มต่อแถว: ลำดับสุ่มของเซนเซอร์ (argsort ของค่าสุ่ม) - ตัวที่ลำดับ < จำนวนที่เสีย ได้ error code
+        rows, m = rows_of('sensor_failure')
+        failing_count = rng.integers(1, 4, size=m)
+        sensor_rank = rng.random((m, 4)).argsort(axis=1)
+        failure_codes = rng.choice([-999, 0, 9999, -1], size=(m, 4))
+        for j, column in enumerate((temperature, humidity, co2, voltage)):
+            failed = sensor_rank[:, j] < failing_count
+            column[rows[failed]] = failure_codes[failed, j]
+        
+        # ความผันผวนสูงในหลายเซนเซอร์
+        rows, m = rows_of('high_fluctuation')
+        temperature[rows] += rng.uniform(10, 25, m) * random_sign(m)
+        humidity[rows] += rng.uniform(-20, 20, m)
+        voltage[rows] += rng.uniform(-0.8, 0.8, m)
+        
+        # Drift ที่ค่อยเป็นค่อยไป
+        rows, m = rows_of('gradual_drift')
+        temperature[rows] = np.minimum(temperature[rows] + rng.uniform(8, 20, m), 60)
+        ec[rows] += rng.uniform(0.8, 2.0, m)
+        ph[rows] += rng.uniform(1.5, 3.0, m)
         
-        return anomaly_data
+        # หลายเซนเซอร์เสียพร้อมกัน
+        rows, m = rows_of('multi_sensor_failure')
+        temperature[rows] = -999
+        humidity[rows] = 0
+        voltage[rows] = 0
+        battery[rows] = 0
+        co2[rows] = -999
+        
+        # สถานการณ์สิ่งแวดล้อมรุนแรง (สุ่ม 1 ใน 3 สถานการณ์ต่อแถว)
+        rows, m = rows_of('environmental_stress')
+        scenario = rng.integers(0, 3, size=m)
+        hot_dry, cold_wet, high_co2 = rows[scenario == 0], rows[scenario == 1], rows[scenario == 2]
+        temperature[hot_dry] = rng.uniform(42, 50, len(hot_dry))
+        humidity[hot_dry] = rng.uniform(15, 25, len(hot_dry))
+        temperature[cold_wet] = rng.uniform(8, 15, len(cold_wet))
+        humidity[cold_wet] = rng.uniform(95, 99, len(cold_wet))
+        co2[high_co2] = rng.uniform(2000, 2500, len(high_co2))
+        temperature[high_co2] = rng.uniform(35, 42, len(high_co2))
+        
+        # กระแสไฟกระชาก
+        rows, m = rows_of('power_surge')
+        voltage[rows] = rng.uniform(4.2, 5.0, m)
+        battery[rows] = rng.uniform(95, 100, m)
+        
+        # การเบี่ยงเบนของการสอบเทียบ
+        rows, m = rows_of('calibration_drift')
+        for column in (ec, ph, co2):
+            column[rows] += rng.uniform(0.5, 2.0, m) * random_sign(m)
+        
+        # คำนวณค่าที่ได้มาใหม่ (เฉพาะแถวที่ข้อมูลยังใช้ได้ - แถวอื่นเป็น 0)
+        dew_point = np.zeros(count)
+        vpd = np.zeros(count)
+        valid = (temperature > -100) & (humidity > 0) & (humidity <= 100)
+        dew_point[valid], vpd[valid] = self.calculate_derived_values_batch(temperature[valid], humidity[valid])
+        
+        # ตรวจสอบค่าสุดท้าย - ค่าที่ไม่ finite เป็น 0
+        for col, values in zip(sensor_columns + ['dew_point', 'vpd'],
+                               (temperature, humidity, co2, ec, ph, voltage, battery, dew_point, vpd)):
+            df[col] = np.where(np.isfinite(values), values, 0)
+        
+        df['anomaly_type'] = types
+        df['is_anomaly'] = 1
+        
+        return df
     
     def generate_comprehensive_dataset_enhanced(self, days=90, normal_ratio=0.80):
         """สร้างชุดข้อมูลที่มีคุณภาพสูงและสมจริง - ปรับปรุงแล้ว"""
@@ -464,8 +591,6 @@ class SensorDataGenerator:
         end_date = datetime.now()
         start_date = end_date - timedelta(days=days)
         
-        all_data = []
-        
         # คำนวณจำนวนข้อมูล
         total_points = int(days * 24 * 6)  # ทุก 10 นาที
         normal_points = int(total_points * normal_ratio)
@@ -477,106 +602,116 @@ class SensorDataGenerator:
         print(f"  - ข้อมูลปกติขอบเขต: {edge_case_points:,}")
         print(f"  - ข้อมูลผิดปกติ: {anomaly_points:,}")
         
-        # สร้างข้อมูลปกติทั่วไป - กระจายตามเวลาจริง
+        # สร้างข้อมูลปกติทั่วไป - กระจายตามเวลาจริง ทุก 10 นาที (สร้างทั้งชุดแบบ vectorized ครั้งเดียว)
         seasons = ['normal', 'summer', 'winter', 'rainy', 'dry']
-        current_time = start_date
-        time_increment = timedelta(minutes=10)
-        
-        for i in range(regular_normal_points):
-            try:
-                season = random.choice(seasons)
-                data = self.generate_normal_data_enhanced(current_time, season)
-                data['anomaly_type'] = 'normal'
-                data['is_anomaly'] = 0
-                all_data.append(data)
-                current_time += time_increment
-            except Exception as e:
-                print(f"Error generating normal data {i}: {e}")
-                continue
+        timestamps = pd.date_range(start=start_date, periods=regular_normal_points, freq='10min')
+        normal_df = self.generate_normal_data_batch(
+            timestamps, self.rng.choice(seasons, size=regular_normal_points)
+        )
+        normal_df['anomaly_type'] = 'normal'
+        normal_df['is_anomaly'] = 0
         
         # สร้างข้อมูลปกติขอบเขต
         print("สร้างข้อมูลขอบเขต...")
-        edge_data = self.generate_edge_case_normal_data(edge_case_points)
-        all_data.extend(edge_data)
+        edge_df = self._generate_edge_case_frame(edge_case_points)
         
         # สร้างข้อมูลผิดปกติ
         print("สร้างข้อมูลผิดปกติ...")
-        anomaly_data = self.generate_sophisticated_anomalies(anomaly_points)
-        all_data.extend(anomaly_data)
+        anomaly_df = self._generate_anomaly_frame(anomaly_points)
         
         # สร้าง DataFrame
-        df = pd.DataFrame(all_data)
+        df = pd.concat([normal_df, edge_df, anomaly_df], ignore_index=True)
         
         # ทำความสะอาดข้อมูลขั้นสุดท้าย
         numeric_columns = ['temperature', 'humidity', 'co2', 'ec', 'ph', 'voltage', 'battery_level', 'dew_point', 'vpd']
+        error_codes = np.array([-999, -1, 9999])
+        fallback_values = {
+            'temperature': 25.0, 'humidity': 65.0, 'voltage': 3.3,
+            'battery_level': 80.0, 'co2': 800.0, 'ec': 1.5,
+            'ph': 6.5, 'dew_point': 18.0, 'vpd': 1.0
+        }
+        
+        # ช่วงค่าที่สมเหตุสมผลของข้อมูลปกติ: (ต่ำสุด, สูงสุด, ค่าแทนเมื่อเป็น NaN)
+        normal_clip_ranges = {
+            'vpd': (0, 8, 1.0),
+            'temperature': (-30, 70, 25.0),
+            'humidity': (0, 100, 65.0),
+            'voltage': (0, 5, 3.3)
+        }
+        
+        # mask ข้อมูลปกติคำนวณครั้งเดียว ใช้ซ้ำทุกคอลัมน์
+        normal_mask = df['is_anomaly'].to_numpy() == 0
         
         for col in numeric_columns:
             if col in df.columns:
-                # แทนที่ infinity values
-                df[col] = df[col].replace([np.inf, -np.inf], np.nan)
+                values = df[col].to_numpy(dtype=np.float64, copy=True)
                 
-                # จัดการ error codes สำหรับข้อมูลปกติ
-                error_codes = [-999, -1, 9999]
-                for error_code in error_codes:
-                    mask = (df['is_anomaly'] == 0) & (df[col] == error_code)
-                    df.loc[mask, col] = np.nan
+                # แทนที่ infinity values และ error codes ของข้อมูลปกติด้วย NaN
+                values[~np.isfinite(values) | (normal_mask & np.isin(values, error_codes))] = np.nan
                 
                 # จำกัดค่าให้อยู่ในช่วงสมเหตุสมผล (เฉพาะข้อมูลปกติ)
-                if col == 'vpd':
-                    normal_mask = df['is_anomaly'] == 0
-                    df.loc[normal_mask, col] = df.loc[normal_mask, col].apply(
-                        lambda x: np.clip(x, 0, 8) if pd.notnull(x) else 1.0
-                    )
-                elif col == 'temperature':
-                    normal_mask = df['is_anomaly'] == 0
-                    df.loc[normal_mask, col] = df.loc[normal_mask, col].apply(
-                        lambda x: np.clip(x, -30, 70) if pd.notnull(x) else 25.0
-                    )
-                elif col == 'humidity':
-                    normal_mask = df['is_anomaly'] == 0
-                    df.loc[normal_mask, col] = df.loc[normal_mask, col].apply(
-                        lambda x: np.clip(x, 0, 100) if pd.notnull(x) else 65.0
-                    )
-                elif col == 'voltage':
-                    normal_mask = df['is_anomaly'] == 0
-                    df.loc[normal_mask, col] = df.loc[normal_mask, col].apply(
-                        lambda x: np.clip(x, 0, 5) if pd.notnull(x) else 3.3
-                    )
+                if col in normal_clip_ranges:
+                    low, high, default = normal_clip_ranges[col]
+                    normal_values = values[normal_mask]
+                    values[normal_mask] = np.where(np.isnan(normal_values), default,
+                                                   np.clip(normal_values, low, high))
                 
                 # เติมค่าที่หายไปด้วย median ของข้อมูลปกติ
-                normal_data_median = df[df['is_anomaly'] == 0][col].median()
-                if pd.isna(normal_data_median):
-                    fallback_values = {
-                        'temperature': 25.0, 'humidity': 65.0, 'voltage': 3.3,
-                        'battery_level': 80.0, 'co2': 800.0, 'ec': 1.5,
-                        'ph': 6.5, 'dew_point': 18.0, 'vpd': 1.0
-                    }
-                    normal_data_median = fallback_values.get(col, 0)
+                missing = np.isnan(values)
+                if missing.any():
+                    normal_values = values[normal_mask & ~missing]
+                    values[missing] = (np.median(normal_values) if len(normal_values)
+                                       else fallback_values.get(col, 0))
+                elif df[col].dtype.kind != 'f':
+                    values = values.astype(df[col].dtype)
                 
-                df[col] = df[col].fillna(normal_data_median)
+                df[col] = values
+        
+        # สุ่มข้อมูลและ reset index - gather ครั้งเดียวด้วย permutation (ลำดับเดียวกับ sample(frac=1, random_state=42))
+        df = df.take(np.random.RandomState(42).permutation(len(df)))
+        df.reset_index(drop=True, inplace=True)
         
-        # สุ่มข้อมูลและ reset index
-        df = df.sample(frac=1, random_state=42).reset_index(drop=True)
+        # นับด้วย mask ตรงๆ ไม่ต้องกรองทั้ง DataFrame
+        normal_count = int((df['is_anomaly'] == 0).sum())
+        anomaly_count = int((df['is_anomaly'] == 1).sum())
         
         print(f"\nสร้างข้อมูลเสร็จสิ้น: {len(df):,} รายการ")
-        print(f"ข้อมูลปกติ: {len(df[df['is_anomaly'] == 0]):,} รายการ ({len(df[df['is_anomaly'] == 0])/len(df)*100:.1f}%)")
-        print(f"ข้อมูลผิดปกติ: {len(df[df['is_anomaly'] == 1]):,} รายการ ({len(df[df['is_anomaly'] == 1])/len(df)*100:.1f}%)")
+        print(f"ข้อมูลปกติ: {normal_count:,} รายการ ({normal_count/len(df)*100:.1f}%)")
+        print(f"ข้อมูลผิดปกติ: {anomaly_count:,} รายการ ({anomaly_count/len(df)*100:.1f}%)")
         
         return df
     
-    def save_dataset(self, df, filename="enhanced_sensor_data.csv"):
-        """บันทึกข้อมูลพร้อมสถิติรายละเอียด"""
+    def save_dataset(self, df, filename="enhanced_sensor_data.csv", parquet=False):
+        """บันทึกข้อมูลพร้อมสถิติรายละเอียด
+        
+        parquet=True หรือชื่อไฟล์ลงท้าย .parquet: บันทึกเป็น Parquet (snappy, ชนิดข้อมูลคงเดิม) แทน CSV - ต้องมี pyarrow
+        ถ้าไม่มี engine จะบันทึกเป็น CSV ตามเดิม
+        """
         os.makedirs("data", exist_ok=True)
         
         filepath = f"data/{filename}"
-        df.to_csv(filepath, index=False)
+        stem, ext = os.path.splitext(filepath)
+        if parquet or ext == ".parquet":
+            parquet_path = stem + ".parquet"
+            try:
+                df.to_parquet(parquet_path, engine='pyarrow', compression='snappy', index=False)
+                filepath = parquet_path
+            except ImportError as e:
+                print(f"ไม่สามารถบันทึก Parquet ได้ ({e}) - บันทึกเป็น CSV แทน")
+                if ext == ".parquet":
+                    filepath = stem + ".csv"
+                df.to_csv(filepath, index=False)
+        else:
+            df.to_csv(filepath, index=False)
         
         print(f"\nบันทึกข้อมูลลงไฟล์: {filepath}")
         print("="*60)
         print("สถิติข้อมูลรายละเอียด:")
         print(f"  - รายการทั้งหมด: {len(df):,}")
-        print(f"  - ข้อมูลปกติ: {len(df[df['is_anomaly'] == 0]):,} ({len(df[df['is_anomaly'] == 0])/len(df)*100:.1f}%)")
-        print(f"  - ข้อมูลผิดปกติ: {len(df[df['is_anomaly'] == 1]):,} ({len(df[df['is_anomaly'] == 1])/len(df)*100:.1f}%)")
+        normal_count = int((df['is_anomaly'] == 0).sum())
+        anomaly_count = int((df['is_anomaly'] == 1).sum())
+        print(f"  - ข้อมูลปกติ: {normal_count:,} ({normal_count/len(df)*100:.1f}%)")
+        print(f"  - ข้อมูลผิดปกติ: {anomaly_count:,} ({anomaly_count/len(df)*100:.1f}%)")
         
         # สถิติรายละเอียดตามประเภท
         if 'anomaly_type' in df.columns:
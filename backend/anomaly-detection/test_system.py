@@ -483,8 +483,8 @@ class TestRuleBasedDetector(unittest.TestCase):
             'timestamp': datetime.now().isoformat()
         }
         
-        result = self.detector._check_vpd_too_low(vpd_low_data, None, [vpd_low_data])
-        self.assertTrue(result, "VPD too low rule should trigger")
+        result = [a['type'] for a in self.detector.detect_anomalies(vpd_low_data)]
+        self.assertIn('vpd_too_low', result, "VPD too low rule should trigger")
         
         # Low voltage
         low_voltage_data = {
@@ -492,8 +492,8 @@ class TestRuleBasedDetector(unittest.TestCase):
             'timestamp': datetime.now().isoformat()
         }
         
-        result = self.detector._check_low_voltage(low_voltage_data, None, [low_voltage_data])
-        self.assertTrue(result, "Low voltage rule should trigger")
+        result = [a['type'] for a in self.detector.detect_anomalies(low_voltage_data)]
+        self.assertIn('low_voltage', result, "Low voltage rule should trigger")
         
         # Sensor failure
         sensor_failure_data = {
@@ -506,6 +506,50 @@ class TestRuleBasedDetector(unittest.TestCase):
         result = self.detector._check_sensor_failure(sensor_failure_data, None, [sensor_failure_data])
         self.assertTrue(result, "Sensor failure rule should trigger")
 
+    def test_02_stream_buffer_matches_list_api(self):
+        """ทดสอบว่า push() + detect_anomalies() ให้ผลเหมือนการส่ง list"""
+        test_generator = TestDataGenerator()
+        readings = test_generator.generate_normal_variations(10) + test_generator.generate_anomaly_cases(10)
+        
+        for i, reading in enumerate(readings):
+            self.detector.push(reading)
+            streamed = [a['type'] for a in self.detector.detect_anomalies()]
+            from_list = [a['type'] for a in self.detector.detect_anomalies(readings[max(0, i - 15):i + 1])]
+            self.assertEqual(streamed, from_list)
+    
+    def test_03_sensor_failure_numpy_scalars(self):
+        """ทดสอบว่า _check_sensor_failure ตรวจ error code และค่านอกช่วงเมื่อค่าเป็น numpy scalar"""
+        records = [
+            {'temperature': np.int64(-999), 'humidity': np.int64(0), 'voltage': np.float32(3.3)},
+            {'temperature': np.float32(25.5), 'humidity': np.int32(150), 'voltage': np.float64(6.0)},
+            {'temperature': np.int64(-999), 'humidity': np.float32(65.0), 'voltage': np.float32(3.3)},
+            {'temperature': np.float64(25.0), 'humidity': np.int64(60), 'voltage': np.int64(9999)},
+            {'temperature': 25.0, 'humidity': None, 'voltage': np.int16(-1)}
+        ]
+        
+        results = [self.detector._check_sensor_failure(record, None, [record]) for record in records]
+        self.assertEqual(results, [True, True, False, False, True])
+    
+    def test_04_debounce_counts_readings_not_polls(self):
+        """ทดสอบว่า debounce นับจำนวน reading ที่ push ต่ออุปกรณ์ ไม่ใช่จำนวนครั้งที่เรียก detect_anomalies()"""
+        detector = RuleBasedAnomalyDetector(debounce_window=3)
+        low_voltage = {'temperature': 26.0, 'humidity': 65.0, 'vpd': 1.1, 'voltage': 2.8,
+                       'battery_level': 80, 'co2': 750, 'device_id': 'A'}
+        self.assertIn('low_voltage', [a['type'] for a in self.detector.detect_anomalies(low_voltage)])
+        
+        detector.push(low_voltage)
+        for _ in range(5):
+            self.assertEqual(detector.detect_anomalies(), [])
+        
+        # อุปกรณ์อื่นมีตัวนับของตัวเอง - ไม่ทำให้อุปกรณ์ A ครบ window
+        detector.push(dict(low_voltage, device_id='B'))
+        self.assertEqual(detector.detect_anomalies(), [])
+        
+        detector.push(low_voltage)
+        self.assertEqual(detector.detect_anomalies(), [])
+        detector.push(low_voltage)
+        self.assertIn('low_voltage', [a['type'] for a in detector.detect_anomalies()])
+
 class TestMLModels(unittest.TestCase):
     """ทดสอบ ML Models"""
     
@@ -524,6 +568,26 @@ class TestMLModels(unittest.TestCase):
             self.skipTest("Model files not found")
         except Exception as e:
             self.skipTest(f"Model loading failed: {e}")
+    
+    def test_02_bulk_prediction_matches_predict(self):
+        """ทดสอบว่า predict_anomalies_bulk ให้ผลเหมือน predict_anomalies"""
+        try:
+            self.models.load_models("models/anomaly_detection")
+        except Exception as e:
+            self.skipTest(f"Model loading failed: {e}")
+        
+        test_generator = TestDataGenerator()
+        readings = test_generator.generate_normal_variations(600)
+        df_prepared, feature_columns = self.models.prepare_data(pd.DataFrame(readings))
+        X = df_prepared[feature_columns].values.astype(float)
+        
+        for model_name in ('isolation_forest', 'ensemble'):
+            expected = self.models.predict_anomalies(X, model_name)
+            # บังคับใช้ process pool (2 worker, 3 chunk) และกรณี fallback (worker เดียว)
+            pooled = self.models.predict_anomalies_bulk(X, model_name, chunk_size=200, n_workers=2)
+            single = self.models.predict_anomalies_bulk(X, model_name, n_workers=1)
+            np.testing.assert_array_equal(pooled, expected)
+            np.testing.assert_array_equal(single, expected)
 
 class TestReportGenerator:
     """สร้างรายงานผลการทดสอบ"""
@@ -3,8 +3,6 @@ import numpy as np
 from sklearn.model_selection import train_test_split, StratifiedKFold
 from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
 from sklearn.metrics import make_scorer, f1_score
-import matplotlib.pyplot as plt
-import seaborn as sns
 from data_generator import SensorDataGenerator
 from anomaly_models import AnomalyDetectionModels, RuleBasedAnomalyDetector
 import os
@@ -78,19 +76,36 @@ def clean_infinity_and_extreme_values(df):
 def load_or_generate_data(force_generate=False):
     """Load or generate high-quality data with proper anomaly ratio"""
     data_file = "data/sensor_training_data.csv"
+    parquet_file = "data/sensor_training_data.parquet"
     
-    if os.path.exists(data_file) and not force_generate:
+    # ใช้ Parquet เมื่อไม่เก่ากว่า CSV - ถ้าสร้างใหม่แล้วต้อง fallback เป็น CSV ไฟล์ Parquet เก่าจะไม่ถูกใช้แทน
+    parquet_is_current = os.path.exists(parquet_file) and (
+        not os.path.exists(data_file) or os.path.getmtime(parquet_file) >= os.path.getmtime(data_file)
+    )
+    
+    df = None
+    if parquet_is_current and not force_generate:
+        # ไฟล์ Parquet (save_dataset(..., parquet=True)) อ่านเร็วกว่าและได้ชนิดข้อมูลเดิม
+        # ไม่มี engine หรือไฟล์เสีย - ใช้ CSV (หรือสร้างใหม่) แทน
+        print("📂 โหลดข้อมูลจากไฟล์ Parquet...")
+        try:
+            df = pd.read_parquet(parquet_file)
+            logger.info(f"โหลดข้อมูลจากไฟล์: {len(df)} รายการ")
+        except (ImportError, OSError, ValueError) as e:
+            logger.warning(f"อ่านไฟล์ Parquet ไม่ได้ ({e}) - ใช้ CSV แทน")
+    
+    if df is None and os.path.exists(data_file) and not force_generate:
         print("📂 โหลดข้อมูลจากไฟล์...")
         df = pd.read_csv(data_file)
         logger.info(f"โหลดข้อมูลจากไฟล์: {len(df)} รายการ")
-    else:
+    elif df is None:
         print("🔨 สร้างข้อมูลใหม่ (อาจใช้เวลา 1-2 นาที)...")
         generator = SensorDataGenerator()
         df = generator.generate_comprehensive_dataset_enhanced(
             days=365,           # เพิ่มเป็น 1 ปี
             normal_ratio=0.92   # เปลี่ยนเป็น 92:8 (เหมาะสำหรับ anomaly detection)
         )
-        generator.save_dataset(df, "sensor_training_data.csv")
+        generator.save_dataset(df, "sensor_training_data.csv", parquet=True)
         logger.info(f"✅ สร้างข้อมูลใหม่: {len(df)} รายการ")
     
     # Clean data before return
@@ -134,7 +149,7 @@ def validate_data_quality(df):
         quality_score += 2
     
     # Check anomaly ratio
-    anomaly_ratio = len(df[df['is_anomaly'] == 1]) / len(df)
+    anomaly_ratio = int((df['is_anomaly'] == 1).sum()) / len(df)
     print(f"\n📊 อัตราส่วนความผิดปกติ: {anomaly_ratio:.1%}")
     
     if 0.05 <= anomaly_ratio <= 0.15:
@@ -198,8 +213,8 @@ def prepare_training_data(df):
     df_clean = clean_infinity_and_extreme_values(df_clean)
     
     # Balance data for proper anomaly detection
-    anomaly_count = len(df_clean[df_clean['is_anomaly'] == 1])
-    normal_count = len(df_clean[df_clean['is_anomaly'] == 0])
+    anomaly_count = int((df_clean['is_anomaly'] == 1).sum())
+    normal_count = int((df_clean['is_anomaly'] == 0).sum())
     
     print(f"📊 ข้อมูลก่อนปรับสมดุล:")
     print(f"   - ปกติ: {normal_count} ({normal_count/(normal_count+anomaly_count)*100:.1f}%)")
@@ -221,16 +236,17 @@ def prepare_training_data(df):
             
             logger.info(f"ปรับสมดุลข้อมูลเป็น 90:10")
     
-    final_normal = len(df_clean[df_clean['is_anomaly'] == 0])
-    final_anomaly = len(df_clean[df_clean['is_anomaly'] == 1])
+    final_normal = int((df_clean['is_anomaly'] == 0).sum())
+    final_anomaly = int((df_clean['is_anomaly'] == 1).sum())
     
     print(f"\n📊 อัตราส่วนสุดท้าย:")
     print(f"   - ปกติ: {final_normal} ({final_normal/(final_normal+final_anomaly)*100:.1f}%)")
     print(f"   - ผิดปกติ: {final_anomaly} ({final_anomaly/(final_normal+final_anomaly)*100:.1f}%)")
     print(f"   - Ratio: {final_normal/final_anomaly:.1f}:1")
     
-    # Shuffle data
-    df_final = df_clean.sample(frac=1, random_state=42).reset_index(drop=True)
+    # Shuffle data (permutation + take ให้ลำดับเดียวกับ sample(frac=1, random_state=42))
+    df_final = df_clean.take(np.random.RandomState(42).permutation(len(df_clean)))
+    df_final.reset_index(drop=True, inplace=True)
     
     # Final safety check
     df_final = clean_infinity_and_extreme_values(df_final)
@@ -247,7 +263,7 @@ def hyperparameter_optimization(X_train, y_train, anomaly_detector):
         return {}
     
     # Calculate actual contamination
-    contamination = len(y_train[y_train == 1]) / len(y_train)
+    contamination = np.count_nonzero(y_train == 1) / len(y_train)
     
     logger.info(f"📊 Contamination rate: {contamination:.3f}")
     
@@ -352,8 +368,8 @@ def train_and_evaluate_models(df):
     print(f"   - Training: {len(X_train)} records")
     print(f"   - Validation: {len(X_val)} records")
     print(f"   - Test: {len(X_test)} records")
-    print(f"     • Normal: {len(y_test[y_test == 0])}")
-    print(f"     • Anomaly: {len(y_test[y_test == 1])}")
+    print(f"     • Normal: {np.count_nonzero(y_test == 0)}")
+    print(f"     • Anomaly: {np.count_nonzero(y_test == 1)}")
     
     # Get optimized parameters
     best_params = hyperparameter_optimization(X_train, y_train, anomaly_detector)
@@ -517,6 +533,9 @@ def create_performance_visualization(results):
     try:
         print("\n📊 สร้างกราฟประสิทธิภาพ...")
         
+        # import เฉพาะตอนสร้างกราฟ - matplotlib ใช้เวลาโหลดนาน
+        import matplotlib.pyplot as plt
+        
         os.makedirs("plots", exist_ok=True)
         
         plt.style.use('default')
@@ -715,8 +734,8 @@ def main():
         df = load_or_generate_data(force_generate=True)
         
         print(f"\n📊 ข้อมูลทั้งหมด: {len(df)} records")
-        normal_count = len(df[df['is_anomaly'] == 0])
-        anomaly_count = len(df[df['is_anomaly'] == 1])
+        normal_count = int((df['is_anomaly'] == 0).sum())
+        anomaly_count = int((df['is_anomaly'] == 1).sum())
         print(f"   - Normal: {normal_count} ({normal_count/len(df)*100:.1f}%)")
         print(f"   - Anomaly: {anomaly_count} ({anomaly_count/len(df)*100:.1f}%)")
         print(f"   - Ratio: {normal_count/anomaly_count:.1f}:1")